@@ -0,0 +1,356 @@
+import json
+import logging
+import socket
+import sqlite3
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+from time import monotonic, time
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(api_key, observable):
+    """Build a cache key which does not expose the API key."""
+    return f'{sha256(api_key.encode()).hexdigest()}:{observable}'
+
+
+class CacheBackend(metaclass=ABCMeta):
+    """
+    Bounded cache with a per-entry time-to-live.
+
+    Subclasses only have to store, load and drop the entries, while the
+    hit/miss/eviction bookkeeping is shared.
+    """
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._stats_lock = Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, key):
+        """Return the cached value or `None` if there is no fresh one."""
+
+        if not self.enabled:
+            return None
+
+        value = self._get(key)
+
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+
+        if self.enabled and ttl > 0:
+            self._set(key, value, ttl)
+
+    def _count(self, evictions=0, expirations=0):
+        with self._stats_lock:
+            self.evictions += evictions
+            self.expirations += expirations
+
+    def stats(self):
+        size = self.size()
+
+        with self._stats_lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'size': size,
+            }
+
+    @abstractmethod
+    def _get(self, key):
+        """Return the fresh value stored under the key or `None`."""
+
+    @abstractmethod
+    def _set(self, key, value, ttl):
+        """Store the value under the key for `ttl` seconds."""
+
+    @abstractmethod
+    def clear(self):
+        """Drop all the entries."""
+
+    @abstractmethod
+    def size(self):
+        """Return the number of stored entries (or `None` if unknown)."""
+
+
+class MemoryCache(CacheBackend):
+    """
+    In-process cache. Expired entries are dropped when accessed, while the
+    least recently used entry is evicted when the cache is full.
+    """
+
+    def __init__(self, ttl, max_entries):
+        super().__init__(ttl, max_entries)
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at <= monotonic():
+                del self._entries[key]
+                self._count(expirations=1)
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = value, monotonic() + ttl
+            self._entries.move_to_end(key)
+
+            evictions = max(len(self._entries) - self.max_entries, 0)
+            for _ in range(evictions):
+                self._entries.popitem(last=False)
+
+        self._count(evictions=evictions)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        return len(self._entries)
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache stored in a local SQLite file (e.g. under `/tmp` on AWS Lambda) so
+    it survives process restarts and is shared by the processes on a host.
+    """
+
+    def __init__(self, path, ttl, max_entries, namespace='c1fapp'):
+        super().__init__(ttl, max_entries)
+        self.table = f'cache_{namespace}'
+        self._lock = Lock()
+        self._connection = sqlite3.connect(
+            path, timeout=5, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute(
+            f'CREATE TABLE IF NOT EXISTS {self.table} ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+            'expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+
+    def _get(self, key):
+        now = time()
+
+        with self._lock:
+            row = self._connection.execute(
+                f'SELECT value, expires_at FROM {self.table} WHERE key = ?',
+                (key,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            value, expires_at = row
+            if expires_at <= now:
+                self._connection.execute(
+                    f'DELETE FROM {self.table} WHERE key = ?', (key,)
+                )
+                self._count(expirations=1)
+                return None
+
+            self._connection.execute(
+                f'UPDATE {self.table} SET accessed_at = ? WHERE key = ?',
+                (now, key)
+            )
+
+        return json.loads(value)
+
+    def _set(self, key, value, ttl):
+        now = time()
+
+        with self._lock:
+            self._connection.execute(
+                f'INSERT OR REPLACE INTO {self.table} '
+                '(key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value), now + ttl, now)
+            )
+            evictions = self._connection.execute(
+                f'DELETE FROM {self.table} WHERE key IN ('
+                f'SELECT key FROM {self.table} '
+                'ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            ).rowcount
+
+        self._count(evictions=evictions)
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute(f'DELETE FROM {self.table}')
+
+    def size(self):
+        with self._lock:
+            return self._connection.execute(
+                f'SELECT COUNT(*) FROM {self.table}'
+            ).fetchone()[0]
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache stored in a Redis-protocol server shared by all the containers.
+
+    Expiration is delegated to the server, while the number of entries is
+    bounded by the server's own `maxmemory` eviction policy. Any failure to
+    talk to the server is logged and treated as a cache miss. After a failed
+    connection attempt the server is left alone for `backoff` seconds, so
+    that an unreachable server does not cost a connect timeout per lookup.
+    """
+
+    def __init__(self, url, ttl, max_entries, namespace='c1fapp',
+                 timeout=1, backoff=5):
+        super().__init__(ttl, max_entries)
+        url = urlparse(url)
+        self.address = url.hostname or 'localhost', url.port or 6379
+        self.password = url.password
+        self.db = int(url.path.strip('/') or 0)
+        self.prefix = f'{namespace}:'
+        self.timeout = timeout
+        self.backoff = backoff
+        self._lock = Lock()
+        self._socket = None
+        self._reconnect_at = 0
+        self._file = None
+
+    def _connect(self):
+        self._socket = socket.create_connection(self.address, self.timeout)
+        self._file = self._socket.makefile('rb')
+        if self.password:
+            self._send('AUTH', self.password)
+        if self.db:
+            self._send('SELECT', self.db)
+
+    def _disconnect(self):
+        if self._socket is not None:
+            self._file.close()
+            self._socket.close()
+        self._socket = self._file = None
+
+    def _send(self, *args):
+        command = [f'*{len(args)}\r\n'.encode()]
+        for arg in args:
+            arg = str(arg).encode()
+            command.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        self._socket.sendall(b''.join(command))
+        return self._read()
+
+    def _read(self):
+        line = self._file.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError('Connection closed by the Redis server.')
+
+        prefix, payload = line[:1], line[1:-2]
+
+        if prefix == b'+':
+            return payload.decode()
+        if prefix == b'-':
+            raise RedisError(payload.decode())
+        if prefix == b':':
+            return int(payload)
+        if prefix == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            return self._file.read(length + 2)[:-2].decode()
+        if prefix == b'*':
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self._read() for _ in range(length)]
+
+        raise RedisError(f'Unexpected reply from the Redis server: {line}')
+
+    def _execute(self, *args):
+        with self._lock:
+            connecting = self._socket is None
+            if connecting and monotonic() < self._reconnect_at:
+                return None
+
+            try:
+                if connecting:
+                    self._connect()
+                return self._send(*args)
+            except (OSError, RedisError) as error:
+                self._disconnect()
+                if connecting:
+                    self._reconnect_at = monotonic() + self.backoff
+                # Lookups run in worker threads without an app context.
+                logger.warning(f'Redis cache failure: {error}')
+                return None
+
+    def _get(self, key):
+        value = self._execute('GET', self.prefix + key)
+        return None if value is None else json.loads(value)
+
+    def _set(self, key, value, ttl):
+        self._execute(
+            'SET', self.prefix + key, json.dumps(value), 'PX', int(ttl * 1000)
+        )
+
+    def _keys(self):
+        cursor = '0'
+        while True:
+            reply = self._execute(
+                'SCAN', cursor, 'MATCH', f'{self.prefix}*', 'COUNT', 1000
+            )
+            if reply is None:
+                return
+            cursor, keys = reply
+            yield from keys
+            if cursor == '0':
+                return
+
+    def clear(self):
+        for key in list(self._keys()):
+            self._execute('DEL', key)
+
+    def size(self):
+        return None
+
+
+def create_cache(config, ttl, max_entries, namespace='c1fapp'):
+    """Create a cache using the backend selected in the configuration."""
+
+    backend = config['C1FAPP_CACHE_BACKEND']
+
+    if backend == 'sqlite':
+        return SQLiteCache(
+            config['C1FAPP_CACHE_SQLITE_PATH'], ttl, max_entries, namespace
+        )
+
+    if backend == 'redis':
+        return RedisCache(
+            config['C1FAPP_CACHE_REDIS_URL'], ttl, max_entries, namespace
+        )
+
+    return MemoryCache(ttl, max_entries)
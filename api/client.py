@@ -1,14 +1,241 @@
+import json
+import random
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from http import HTTPStatus
+from itertools import chain
+from threading import Lock
+from time import perf_counter, sleep
+
 import requests
+from requests.adapters import HTTPAdapter
 
 from flask import current_app
 
-from api.errors import UnexpectedC1fAppError, C1fAppSSLError
+from api.cache import cache_key, create_cache
+from api.concurrency import (
+    AdaptiveLimiter, CircuitBreaker, Deadline, SingleFlight
+)
+from api.errors import (
+    UnexpectedC1fAppError, C1fAppSSLError, C1fAppCircuitOpenError,
+    C1fAppDeadlineError, C1fAppRateLimitError, C1fAppTimeoutError,
+    C1fAppUnavailableError, TRFormattedError
+)
+from api.metrics import (
+    C1FAPP_CIRCUIT_REJECTED, C1FAPP_ERRORS, C1FAPP_RATE_LIMIT_WAIT,
+    C1FAPP_RATE_LIMITED, C1FAPP_REQUEST_DURATION, C1FAPP_RESPONSE_RECORDS,
+    C1FAPP_RETRIES
+)
+from api.ratelimit import create_token_bucket
+from api.stream import iter_json_array, iter_text, prune, top_records
+from api.timing import get_timings
+from api.utils import key_error_handler
 
 NOT_CRITICAL_ERRORS = (
     'Unsupported request ? IPv4/Domain only',
     'Empty Search! Available search: IPv4/URL/Domain'
 )
 
+# Lookups only read data, so these failures are safe to retry.
+RETRY_STATUS_CODES = (
+    HTTPStatus.TOO_MANY_REQUESTS,
+    HTTPStatus.SERVICE_UNAVAILABLE,
+)
+
+_session = None
+_session_lock = Lock()
+
+_cache = None
+_cache_lock = Lock()
+
+_negative_cache = None
+_negative_cache_lock = Lock()
+
+_rate_limiter = None
+_rate_limiter_lock = Lock()
+
+_concurrency_limiter = None
+_concurrency_limiter_lock = Lock()
+
+_circuit_breaker = None
+_circuit_breaker_lock = Lock()
+
+_lookups = SingleFlight()
+
+
+def get_session():
+    """
+    Return the process-wide `requests.Session` used to talk to C1fApp.
+
+    The session is created once per process (i.e. per warm Lambda container)
+    so its pooled keep-alive connections are reused by subsequent requests
+    and by concurrent lookups. The pool holds at least as many connections
+    as there may be lookups in flight, so that none of them is discarded.
+    """
+
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            pool_size = max(
+                current_app.config['C1FAPP_POOL_SIZE'],
+                current_app.config['C1FAPP_MAX_WORKERS'],
+                current_app.config['C1FAPP_MAX_CONCURRENCY']
+            )
+            adapter = HTTPAdapter(
+                pool_connections=pool_size, pool_maxsize=pool_size
+            )
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            if not current_app.config['C1FAPP_KEEP_ALIVE']:
+                session.headers['Connection'] = 'close'
+            _session = session
+
+        return _session
+
+
+def connection_stats():
+    """
+    Return the number of requests sent through the shared session along with
+    the number of connections opened and reused for them.
+    """
+
+    requests_count = connections_count = 0
+
+    if _session is not None:
+        for adapter in set(_session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    requests_count += pool.num_requests
+                    connections_count += pool.num_connections
+
+    return {
+        'requests': requests_count,
+        'connections': connections_count,
+        'reused': requests_count - connections_count,
+    }
+
+
+def get_cache():
+    """Return the process-wide cache of C1fApp responses."""
+
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = create_cache(
+                current_app.config,
+                current_app.config['C1FAPP_CACHE_TTL'],
+                current_app.config['C1FAPP_CACHE_MAX_ENTRIES']
+            )
+
+        return _cache
+
+
+def get_rate_limiter():
+    """Return the process-wide token buckets of the C1fApp API keys."""
+
+    global _rate_limiter
+
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = create_token_bucket(current_app.config)
+
+        return _rate_limiter
+
+
+def get_concurrency_limiter():
+    """
+    Return the process-wide adaptive limit of concurrent C1fApp requests,
+    or `None` if it is disabled. The limit starts at `C1FAPP_MAX_WORKERS`,
+    so that a cold container is as fast as with a fixed level, and grows up
+    to `C1FAPP_MAX_CONCURRENCY` while C1fApp keeps up.
+    """
+
+    global _concurrency_limiter
+
+    if not current_app.config['C1FAPP_ADAPTIVE_CONCURRENCY']:
+        return None
+
+    with _concurrency_limiter_lock:
+        if _concurrency_limiter is None:
+            max_limit = current_app.config['C1FAPP_MAX_CONCURRENCY']
+            _concurrency_limiter = AdaptiveLimiter(
+                max_limit,
+                initial_limit=min(
+                    current_app.config['C1FAPP_MAX_WORKERS'], max_limit
+                )
+            )
+
+        return _concurrency_limiter
+
+
+def get_circuit_breaker():
+    """
+    Return the process-wide circuit breaker of the C1fApp lookups, or `None`
+    if it is disabled.
+    """
+
+    global _circuit_breaker
+
+    if not current_app.config['C1FAPP_CIRCUIT_BREAKER']:
+        return None
+
+    with _circuit_breaker_lock:
+        if _circuit_breaker is None:
+            _circuit_breaker = CircuitBreaker(
+                failure_rate=current_app.config['C1FAPP_CIRCUIT_FAILURE_RATE'],
+                min_calls=current_app.config['C1FAPP_CIRCUIT_MIN_LOOKUPS'],
+                window=current_app.config['C1FAPP_CIRCUIT_WINDOW'],
+                open_for=current_app.config['C1FAPP_CIRCUIT_OPEN_FOR'],
+            )
+
+        return _circuit_breaker
+
+
+def is_outage(error):
+    """Check whether a lookup failed since C1fApp is down or struggling."""
+
+    if isinstance(error, UnexpectedC1fAppError):
+        return error.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR
+
+    return isinstance(error, (C1fAppTimeoutError, C1fAppUnavailableError))
+
+
+def is_shared(error):
+    """
+    Check whether a coalesced lookup failed for reasons which apply to the
+    lookups waiting for it too, rather than since the budget of the request
+    which made it ran out.
+    """
+
+    return not isinstance(error, (C1fAppDeadlineError, C1fAppRateLimitError))
+
+
+def get_negative_cache():
+    """
+    Return the process-wide cache of the C1fApp lookups which found nothing
+    (or were not supported), kept apart from the other responses so that it
+    can have a shorter TTL and a bound of its own.
+    """
+
+    global _negative_cache
+
+    with _negative_cache_lock:
+        if _negative_cache is None:
+            _negative_cache = create_cache(
+                current_app.config,
+                current_app.config['C1FAPP_NEGATIVE_CACHE_TTL'],
+                current_app.config['C1FAPP_NEGATIVE_CACHE_MAX_ENTRIES'],
+                namespace='c1fapp_negative'
+            )
+
+        return _negative_cache
+
 
 class C1fAppClient:
     def __init__(self, api_key):
@@ -21,21 +248,297 @@ class C1fAppClient:
             **current_app.config['REQUEST_DATA'],
             'key': api_key
         }
+        self.concurrency_limiter = get_concurrency_limiter()
+        # The adaptive limit decides how many of the workers send requests.
+        self.max_workers = (
+            current_app.config['C1FAPP_MAX_CONCURRENCY']
+            if self.concurrency_limiter is not None
+            else current_app.config['C1FAPP_MAX_WORKERS']
+        )
+        self.stream = current_app.config['C1FAPP_STREAM_RESPONSES']
+        self.limit = current_app.config['CTR_ENTITIES_LIMIT']
+        self.deadline = Deadline(current_app.config['C1FAPP_DEADLINE'])
+        self.connect_timeout = current_app.config['C1FAPP_CONNECT_TIMEOUT']
+        self.retries = current_app.config['C1FAPP_RETRIES']
+        self.retry_backoff = current_app.config['C1FAPP_RETRY_BACKOFF']
+        self.rate_limiter = get_rate_limiter()
+        self.circuit_breaker = get_circuit_breaker()
+        self.rate_limit_key = sha256(api_key.encode()).hexdigest()
+        self.rate_limit_max_wait = \
+            current_app.config['C1FAPP_RATE_LIMIT_MAX_WAIT']
+        self.session = get_session()
+        self.cache = get_cache()
+        self.negative_cache = get_negative_cache()
+        # Captured here since the lookups may run outside the app context.
+        self.timings = get_timings()
 
     def get_c1fapp_response(self, observable):
-        self.data.update({'request': observable})
+        key = cache_key(self.data['key'], observable)
+
+        with self.timings.measure('upstream', observable):
+            # Most lookups find nothing, so check their cache first.
+            result = self.negative_cache.get(key)
+            if result is None:
+                result = self.cache.get(key)
+            if result is None:
+                if self.deadline.expired:
+                    raise C1fAppDeadlineError(observable)
+                try:
+                    result = _lookups.do(
+                        key, self._lookup, key, observable,
+                        timeout=self.deadline.remaining(), shared=is_shared
+                    )
+                except futures.TimeoutError:
+                    raise C1fAppDeadlineError(observable)
+
+        return result
+
+    def _lookup(self, key, observable):
+        """
+        Look up the observable in C1fApp (unless the circuit breaker is open)
+        and cache the result.
+        """
 
+        breaker = self.circuit_breaker
+        probe = breaker.allow() if breaker is not None else False
+        if probe is None:
+            C1FAPP_CIRCUIT_REJECTED.inc()
+            raise C1fAppCircuitOpenError()
+
+        start = perf_counter()
+        # Lookups which have not reached C1fApp do not tell anything.
+        failed = None
         try:
-            response = requests.post(
-                self.api_url, headers=self.headers, json=self.data
-            )
-        except requests.exceptions.SSLError as exception:
-            raise C1fAppSSLError(exception)
+            result = self._request(observable)
+            failed = False
+        except (C1fAppDeadlineError, C1fAppRateLimitError) as error:
+            C1FAPP_ERRORS.inc(code=error.code)
+            raise
+        except TRFormattedError as error:
+            failed = is_outage(error)
+            C1FAPP_ERRORS.inc(code=error.code)
+            raise
+        finally:
+            C1FAPP_REQUEST_DURATION.observe(perf_counter() - start)
+            if breaker is not None:
+                breaker.record(failed, probe)
+
+        cache = self.cache if result else self.negative_cache
+        cache.set(key, result)
+        return result
+
+    def _request(self, observable):
+        data = {**self.data, 'request': observable}
+
+        for attempt in range(self.retries + 1):
+            retry = attempt < self.retries
+
+            try:
+                response, records = self._post(observable, data)
+            except requests.exceptions.ConnectTimeout:
+                # The request has not been sent, so it is safe to try again.
+                if retry and self._backoff(attempt, 'connect timeout'):
+                    continue
+                raise C1fAppTimeoutError(observable)
+
+            if response.status_code in RETRY_STATUS_CODES and retry and \
+                    self._backoff(attempt, str(response.status_code),
+                                  response.headers.get('Retry-After')):
+                response.close()
+                continue
+
+            break
+
+        if self.stream and response.ok:
+            return records
 
         if response.text in NOT_CRITICAL_ERRORS:
-            return []
+            return self._records([])
 
         if response.ok:
-            return response.json()
+            return self._latest_records(response.json())
 
         raise UnexpectedC1fAppError(response)
+
+    def _post(self, observable, data):
+        """
+        Send a lookup (within the rate and concurrency limits) with the connect
+        and read timeouts bounded by the time left until the deadline. Return
+        the response along with its records if they are streamed, since the
+        body is then read while the lookup is still in flight. The outcome of
+        the lookup adapts the concurrency limit.
+        """
+
+        self._throttle(observable)
+
+        limiter = self.concurrency_limiter
+        if limiter is not None and \
+                not limiter.acquire(self.deadline.remaining()):
+            raise C1fAppDeadlineError(observable)
+
+        start = perf_counter()
+        latency = None
+        overloaded = False
+
+        try:
+            remaining = self.deadline.remaining()
+            if not remaining:
+                raise C1fAppDeadlineError(observable)
+
+            response = self.session.post(
+                self.api_url, headers=self.headers, json=data,
+                stream=self.stream,
+                timeout=(min(self.connect_timeout, remaining), remaining)
+            )
+            latency = perf_counter() - start
+            overloaded = response.status_code in RETRY_STATUS_CODES
+
+            if not self.stream:
+                return response, None
+
+            try:
+                if response.ok:
+                    return response, self._read_records(response)
+                # Read the (short) error bodies here as well, so that failing
+                # to read them is reported like the other failures.
+                response.content
+                return response, None
+            except requests.exceptions.ConnectionError:
+                # Raised by requests when reading the body times out.
+                overloaded = True
+                raise C1fAppTimeoutError(observable)
+            finally:
+                response.close()
+        except requests.exceptions.SSLError as exception:
+            raise C1fAppSSLError(exception)
+        except requests.exceptions.ReadTimeout:
+            overloaded = True
+            raise C1fAppTimeoutError(observable)
+        except requests.exceptions.ConnectTimeout:
+            overloaded = True
+            raise
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.ChunkedEncodingError):
+            # The connection was refused, reset or closed before the end.
+            overloaded = True
+            raise C1fAppUnavailableError()
+        finally:
+            if limiter is not None:
+                limiter.release(latency, overloaded)
+
+    def _throttle(self, observable):
+        """
+        Wait for a token of the rate limit of the API key for as long as
+        `C1FAPP_RATE_LIMIT_MAX_WAIT` allows (and the deadline).
+        """
+
+        max_wait = min(self.rate_limit_max_wait, self.deadline.remaining())
+        wait = self.rate_limiter.take(self.rate_limit_key, max_wait)
+
+        if wait is None:
+            C1FAPP_RATE_LIMITED.inc(outcome='rejected')
+            raise C1fAppRateLimitError(observable)
+
+        if wait:
+            C1FAPP_RATE_LIMITED.inc(outcome='queued')
+            C1FAPP_RATE_LIMIT_WAIT.observe(wait)
+            sleep(wait)
+
+    def _backoff(self, attempt, reason, retry_after=None):
+        """
+        Wait before the next attempt for a random ("full jitter") delay of up
+        to `C1FAPP_RETRY_BACKOFF * 2 ** attempt` seconds, or for as long as
+        C1fApp asks to. Return `False` without waiting if the next attempt
+        would not fit before the deadline.
+        """
+
+        delay = random.uniform(0, self.retry_backoff * 2 ** attempt)
+
+        try:
+            delay = max(delay, float(retry_after))
+        except (TypeError, ValueError):
+            pass
+
+        if delay >= self.deadline.remaining():
+            return False
+
+        C1FAPP_RETRIES.inc(reason=reason)
+        sleep(delay)
+        return True
+
+    @staticmethod
+    def _records(records, count=None):
+        if count is None:
+            count = len(records) if isinstance(records, list) else 0
+        C1FAPP_RESPONSE_RECORDS.observe(count)
+        return records
+
+    @key_error_handler
+    def _latest_records(self, records):
+        """
+        Keep only the `CTR_ENTITIES_LIMIT` most recent records with the fields
+        in use, as when streaming, so that the cached responses stay small.
+        """
+
+        if not isinstance(records, list):
+            return self._records(records)
+
+        latest = top_records(prune(records), self.limit)
+        return self._records(latest, len(records))
+
+    @key_error_handler
+    def _read_records(self, response):
+        """
+        Parse the records from a streamed response one by one keeping only
+        the `CTR_ENTITIES_LIMIT` most recent ones with the fields in use.
+        """
+
+        chunks = iter_text(response)
+
+        head = ''
+        for chunk in chunks:
+            head += chunk
+            if head.strip():
+                break
+
+        if not head.lstrip().startswith('['):
+            text = head + ''.join(chunks)
+            if text in NOT_CRITICAL_ERRORS:
+                return self._records([])
+            return self._records(json.loads(text))
+
+        count = 0
+
+        def counted(records):
+            nonlocal count
+            for count, record in enumerate(records, 1):
+                yield record
+
+        records = counted(prune(iter_json_array(chain([head], chunks))))
+        latest = top_records(records, self.limit)
+        return self._records(latest, count)
+
+    def _get_c1fapp_response_or_error(self, observable):
+        try:
+            return self.get_c1fapp_response(observable), None
+        except TRFormattedError as error:
+            return None, error
+
+    def get_c1fapp_responses(self, observables):
+        """
+        Look up the observables concurrently (at most `C1FAPP_MAX_WORKERS`
+        at a time, or as many as the adaptive concurrency limit allows up to
+        `C1FAPP_MAX_CONCURRENCY`) and yield (response, error) pairs in the
+        order of the observables, so that a failed lookup does not affect the
+        others.
+        """
+
+        lookup = self._get_c1fapp_response_or_error
+        workers = min(self.max_workers, len(observables))
+
+        if workers <= 1:
+            yield from map(lookup, observables)
+            return
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(lookup, observables)
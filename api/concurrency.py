@@ -0,0 +1,256 @@
+from collections import deque
+from concurrent.futures import Future
+from threading import Condition, Lock
+from time import monotonic
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls made with the same key so that only the first
+    one is actually performed while the others wait for and share its result
+    (or its exception).
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, timeout=None, shared=None):
+        """
+        Call `func(*args)` or wait (for up to `timeout` seconds, raising
+        `concurrent.futures.TimeoutError` past them) for the call with the
+        same key already in flight.
+
+        The exceptions `shared(exception)` rejects (e.g. those only due to the
+        caller which made the call) are not shared: the callers waiting for
+        them make the call again instead.
+        """
+
+        expires_at = None if timeout is None else monotonic() + timeout
+
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = Future()
+
+            if leader:
+                break
+
+            remaining = (None if expires_at is None
+                         else max(expires_at - monotonic(), 0))
+            try:
+                return call.result(remaining)
+            except BaseException as error:
+                if not call.done() or shared is None or shared(error):
+                    raise
+
+        try:
+            result = func(*args)
+        except BaseException as error:
+            call.set_exception(error)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class Deadline:
+    """Point in time by which some work has to be finished."""
+
+    def __init__(self, budget):
+        self.expires_at = monotonic() + budget
+
+    def remaining(self):
+        return max(self.expires_at - monotonic(), 0)
+
+    @property
+    def expired(self):
+        return not self.remaining()
+
+
+class AdaptiveLimiter:
+    """
+    Limit of concurrent calls adapted to how they go, AIMD-style: the limit
+    grows by one call per round of calls while they stay as fast as usual,
+    and is cut by `backoff` as soon as one is rejected as overloading the
+    callee or gets `latency_tolerance` times slower than usual.
+
+    The usual latency is a slow moving average of the latencies of the calls.
+    The limit is cut at most once per usual latency (i.e. a round trip) since
+    the calls already in flight are likely to fail the same way.
+    """
+
+    def __init__(self, max_limit, min_limit=1, initial_limit=None,
+                 backoff=0.5, latency_tolerance=2, smoothing=0.05):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(initial_limit or max_limit)
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self.latency = None
+        self.in_flight = 0
+        self.waiting = 0
+        self._decreased_at = None
+        self._condition = Condition()
+
+    def acquire(self, timeout=None):
+        """
+        Wait for the number of calls in flight to get below the limit and
+        start one. Return `False` if that has not happened within `timeout`.
+        """
+
+        expires_at = None if timeout is None else monotonic() + timeout
+
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                remaining = (None if expires_at is None
+                             else expires_at - monotonic())
+                if remaining is not None and remaining <= 0:
+                    return False
+
+                self.waiting += 1
+                try:
+                    self._condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+            self.in_flight += 1
+            return True
+
+    def release(self, latency=None, overloaded=False):
+        """
+        Finish a call which took `latency` seconds (`None` if it failed for
+        reasons unrelated to the load) and adapt the limit accordingly.
+        """
+
+        now = monotonic()
+
+        with self._condition:
+            self.in_flight -= 1
+
+            slow = latency is not None and self.latency is not None and \
+                latency > self.latency * self.latency_tolerance
+
+            if overloaded or slow:
+                if self._decreased_at is None or \
+                        now - self._decreased_at >= (self.latency or 0):
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._decreased_at = now
+            elif latency is not None:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+            if latency is not None and not overloaded:
+                self.latency = latency if self.latency is None else \
+                    self.latency + self.smoothing * (latency - self.latency)
+
+            self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'limit': int(self.limit),
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+            }
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker failing calls fast while the callee is down.
+
+    The circuit is closed (calls go through) until at least `failure_rate`
+    of the last `window` seconds of calls (and at least `min_calls` of them)
+    fail. Then it opens (calls are rejected) for `open_for` seconds and gets
+    half-open: `probes` calls go through to check whether the callee is back,
+    closing the circuit if one of them succeeds or opening it again if one of
+    them fails.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_rate=0.5, min_calls=10, window=60,
+                 open_for=30, probes=1):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_for = open_for
+        self.probes = probes
+        self.state = self.CLOSED
+        self._calls = deque()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = 0
+        self._lock = Lock()
+
+    def allow(self):
+        """
+        Check whether a call may go through (and start it if so). Return
+        `None` if it may not, otherwise whether the call is a probe of the
+        half-open circuit.
+        """
+
+        with self._lock:
+            if self.state == self.OPEN:
+                if monotonic() - self._opened_at < self.open_for:
+                    return None
+                self.state = self.HALF_OPEN
+                self._probing = 0
+
+            if self.state == self.HALF_OPEN:
+                if self._probing >= self.probes:
+                    return None
+                self._probing += 1
+                return True
+
+            return False
+
+    def record(self, failed, probe=False):
+        """
+        Finish a call which either failed (`True`), succeeded (`False`) or
+        was not made after all (`None`). Only the probes (see `allow`) decide
+        the state of the half-open circuit: the calls started while it was
+        closed may finish after it opened and are ignored then.
+        """
+
+        now = monotonic()
+
+        with self._lock:
+            if probe:
+                if self.state == self.HALF_OPEN:
+                    self._probing = max(self._probing - 1, 0)
+                    if failed:
+                        self._open(now)
+                    elif failed is not None:
+                        self._close()
+                return
+
+            if failed is None or self.state != self.CLOSED:
+                return
+
+            self._calls.append((now, failed))
+            self._failures += failed
+
+            while self._calls and self._calls[0][0] <= now - self.window:
+                _, expired_failed = self._calls.popleft()
+                self._failures -= expired_failed
+
+            if len(self._calls) >= self.min_calls and \
+                    self._failures >= self.failure_rate * len(self._calls):
+                self._open(now)
+
+    def _open(self, now):
+        self.state = self.OPEN
+        self._opened_at = now
+
+    def _close(self):
+        self.state = self.CLOSED
+        self._calls.clear()
+        self._failures = 0
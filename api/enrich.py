@@ -2,15 +2,22 @@ from functools import partial
 
 from flask import Blueprint, g, current_app
 from api.client import C1fAppClient
+from api.errors import C1fAppLookupWarning, TRFormattedError
 from api.mappings import Mapping
+from api.metrics import RELAY_ENTITIES, RELAY_OBSERVABLES
 
-from api.schemas import ObservableSchema
-from api.utils import get_json, get_jwt, jsonify_data, jsonify_result
+from api.schemas import ObservableValidator
+from api.utils import (
+    get_json, get_jwt, jsonify_data, jsonify_result, latest_records,
+    remove_duplicates, stream_result
+)
 
 enrich_api = Blueprint('enrich', __name__)
 
 
-get_observables = partial(get_json, schema=ObservableSchema(many=True))
+ENTITY_TYPES = ('sighting', 'indicator', 'relationship')
+
+get_observables = partial(get_json, schema=ObservableValidator())
 
 
 @enrich_api.route('/deliberate/observables', methods=['POST'])
@@ -24,32 +31,72 @@ def observe_observables():
     key = get_jwt().get('key', '')
 
     client = C1fAppClient(key)
-    observables = get_observables()
+    observables = remove_duplicates(get_observables())
+
+    for observable in observables:
+        RELAY_OBSERVABLES.inc(type=observable['type'])
 
     g.sightings = []
     g.indicators = []
     g.relationships = []
+    g.errors = []
 
     limit = current_app.config['CTR_ENTITIES_LIMIT']
 
-    for observable in observables:
-        mapping = Mapping.for_(observable)
-
-        if mapping:
-            response_data = client.get_c1fapp_response(observable['value'])
-            response_data.sort(
-                key=lambda x: x['reportime'], reverse=True
-            )
-            response_data = response_data[:limit]
-            g.sightings.extend(
-                mapping.extract_sightings(response_data)
-            )
-            g.indicators.extend(
-                mapping.extract_indicators(response_data)
-            )
-            g.relationships.extend(
-                mapping.extract_relationships()
-            )
+    mappings = [
+        Mapping.for_(observable) for observable in observables
+        if Mapping.supports(observable['type'])
+    ]
+    responses = client.get_c1fapp_responses(
+        [mapping.observable['value'] for mapping in mappings]
+    )
+
+    def bundles():
+        """
+        Map the responses one by one, isolating the failures of single
+        observables: they are reported as warnings along with the results of
+        the others. Only if all the lookups fail is the first fatal error
+        raised as before.
+        """
+
+        errors = []
+
+        for mapping, (response_data, error) in zip(mappings, responses):
+            if error is None:
+                try:
+                    bundle = mapping.extract(
+                        latest_records(response_data, limit)
+                    )
+                except TRFormattedError as exception:
+                    error = exception
+
+            if error is not None:
+                errors.append((mapping.observable['value'], error))
+                continue
+
+            for type_, entities in zip(ENTITY_TYPES, bundle):
+                RELAY_ENTITIES.inc(len(entities), type=type_)
+            yield bundle
+
+        if errors and len(errors) == len(mappings):
+            for _, error in errors:
+                if error.type_ != 'warning':
+                    raise error
+
+        g.errors.extend(
+            (error if error.type_ == 'warning'
+             else C1fAppLookupWarning(observable, error)).json
+            for observable, error in errors
+        )
+
+    if current_app.config['CTR_STREAM_RESPONSES']:
+        return stream_result(bundles())
+
+    for sightings, indicators, relationships in bundles():
+        g.sightings.extend(sightings)
+        g.indicators.extend(indicators)
+        g.relationships.extend(relationships)
+
     return jsonify_result()
 
 
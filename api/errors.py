@@ -9,6 +9,8 @@ UNAUTHORIZED = 'unauthorized'
 NOT_FOUND = 'not found'
 UNAVAILABLE = 'unavailable'
 KEY_ERROR = 'key error'
+DEADLINE_EXCEEDED = 'deadline exceeded'
+TIMEOUT = 'timeout'
 
 
 class TRFormattedError(Exception):
@@ -57,6 +59,7 @@ class UnexpectedC1fAppError(TRFormattedError):
             status_code_map.get(response.status_code),
             f'Unexpected response from C1fApp: {response.text}'
         )
+        self.status_code = response.status_code
 
 
 class C1fAppKeyError(TRFormattedError):
@@ -78,3 +81,61 @@ class C1fAppSSLError(TRFormattedError):
             code=UNKNOWN,
             message=f'Unable to verify SSL certificate: {message.capitalize()}'
         )
+
+
+class C1fAppDeadlineError(TRFormattedError):
+    def __init__(self, observable):
+        super().__init__(
+            code=DEADLINE_EXCEEDED,
+            message=f'The lookup of {observable} in C1fApp was skipped '
+                    'since the time budget of the request ran out.',
+            type_='warning'
+        )
+
+
+class C1fAppTimeoutError(TRFormattedError):
+    def __init__(self, observable):
+        super().__init__(
+            code=TIMEOUT,
+            message=f'C1fApp did not respond to the lookup of {observable} '
+                    'within the time budget of the request.',
+            type_='warning'
+        )
+
+
+class C1fAppRateLimitError(TRFormattedError):
+    def __init__(self, observable):
+        super().__init__(
+            code=TOO_MANY_REQUESTS,
+            message=f'The lookup of {observable} in C1fApp was skipped '
+                    'since the rate limit of the API key did not allow it '
+                    'in time.',
+            type_='warning'
+        )
+
+
+class C1fAppUnavailableError(TRFormattedError):
+    def __init__(self):
+        super().__init__(
+            code=UNAVAILABLE,
+            message='Unable to connect to C1fApp.'
+        )
+
+
+class C1fAppCircuitOpenError(TRFormattedError):
+    def __init__(self):
+        super().__init__(
+            code=UNAVAILABLE,
+            message='C1fApp is unavailable at the moment since its recent '
+                    'lookups have been failing. Please try again later.'
+        )
+
+
+class C1fAppLookupWarning(TRFormattedError):
+    def __init__(self, observable, error):
+        super().__init__(
+            code=error.code,
+            message=f'Unable to look up {observable} in C1fApp. '
+                    f'{error.message}',
+            type_='warning'
+        )
@@ -1,6 +1,11 @@
-from flask import Blueprint
-from api.client import C1fAppClient
-from api.utils import get_jwt, jsonify_data
+from flask import Blueprint, current_app
+from api.client import (
+    C1fAppClient, connection_stats, get_cache, get_circuit_breaker,
+    get_concurrency_limiter, get_negative_cache
+)
+from api.concurrency import CircuitBreaker
+from api.metrics import CONTENT_TYPE, REGISTRY
+from api.utils import get_jwt, get_jwt_cache, jsonify_data
 
 health_api = Blueprint('health', __name__)
 
@@ -13,3 +18,71 @@ def health():
     _ = client.get_c1fapp_response('test.com')
 
     return jsonify_data({'status': 'ok'})
+
+
+@health_api.route('/metrics', methods=['GET'])
+def metrics():
+    return current_app.response_class(
+        REGISTRY.expose(), content_type=CONTENT_TYPE
+    )
+
+
+@REGISTRY.collector
+def collect_metrics():
+    """
+    Expose the statistics of the caches, of the C1fApp connections, of the
+    adaptive concurrency limit and the state of the circuit breaker.
+    """
+
+    caches = {
+        'c1fapp': get_cache(),
+        'c1fapp_negative': get_negative_cache(),
+        'jwt': get_jwt_cache(),
+    }
+    stats = {name: cache.stats() for name, cache in caches.items()}
+
+    for stat, help_ in (
+            ('hits', 'Cache lookups which found a fresh entry.'),
+            ('misses', 'Cache lookups which did not find a fresh entry.'),
+            ('evictions', 'Entries evicted to keep the caches bounded.'),
+            ('expirations', 'Expired entries dropped from the caches.'),
+    ):
+        yield f'relay_cache_{stat}', 'counter', help_, [
+            ('_total', (('cache', name),), cache_stats[stat])
+            for name, cache_stats in stats.items()
+        ]
+
+    yield 'relay_cache_entries', 'gauge', 'Entries stored in the caches.', [
+        ('', (('cache', name),), cache_stats['size'])
+        for name, cache_stats in stats.items()
+        if cache_stats['size'] is not None
+    ]
+
+    connections = connection_stats()
+    yield ('c1fapp_connection_requests', 'counter',
+           'Requests sent to the C1fApp API through pooled connections.',
+           [('_total', (), connections['requests'])])
+    yield ('c1fapp_connections_opened', 'counter',
+           'Connections opened to the C1fApp API.',
+           [('_total', (), connections['connections'])])
+
+    limiter = get_concurrency_limiter()
+    if limiter is not None:
+        limits = limiter.stats()
+        yield ('c1fapp_concurrency_limit', 'gauge',
+               'Current adaptive limit of concurrent C1fApp API requests.',
+               [('', (), limits['limit'])])
+        yield ('c1fapp_concurrency_in_flight', 'gauge',
+               'C1fApp API requests in flight.',
+               [('', (), limits['in_flight'])])
+        yield ('c1fapp_concurrency_queue_depth', 'gauge',
+               'C1fApp API requests waiting for the concurrency limit.',
+               [('', (), limits['waiting'])])
+
+    breaker = get_circuit_breaker()
+    if breaker is not None:
+        yield ('c1fapp_circuit_state', 'gauge',
+               'State of the circuit breaker of the C1fApp API lookups.',
+               [('', (('state', state),), int(breaker.state == state))
+                for state in (CircuitBreaker.CLOSED, CircuitBreaker.HALF_OPEN,
+                              CircuitBreaker.OPEN)])
@@ -0,0 +1,60 @@
+import json
+import os
+from hashlib import sha256
+from threading import Lock
+
+UUID_SIZE = 16
+
+# Maps a hex digit to the one with the RFC 4122 variant bits set.
+_VARIANTS = {digit: '89ab'[int(digit, 16) & 3] for digit in '0123456789abcdef'}
+
+
+def format_uuid(raw, version):
+    """Format 16 bytes as an RFC 4122 UUID string of the given version."""
+
+    raw = bytearray(raw)
+    raw[6] = raw[6] & 0x0f | version << 4
+    raw[8] = raw[8] & 0x3f | 0x80
+    value = raw.hex()
+    return (f'{value[:8]}-{value[8:12]}-{value[12:16]}-'
+            f'{value[16:20]}-{value[20:]}')
+
+
+class RandomIds:
+    """
+    Generate random (version 4) UUIDs drawing the entropy from the OS in
+    batches instead of calling `os.urandom` once per UUID.
+    """
+
+    def __init__(self, batch_size=1024):
+        self.batch_size = batch_size
+        self._buffer = ''
+        self._position = 0
+        self._lock = Lock()
+
+    def __call__(self, *content):
+        with self._lock:
+            if self._position == len(self._buffer):
+                self._buffer = os.urandom(UUID_SIZE * self.batch_size).hex()
+                self._position = 0
+            start = self._position
+            self._position += 2 * UUID_SIZE
+            value = self._buffer[start:self._position]
+
+        return (f'{value[:8]}-{value[8:12]}-4{value[13:16]}-'
+                f'{_VARIANTS[value[16]]}{value[17:20]}-{value[20:]}')
+
+
+def content_id(*content):
+    """
+    Generate a deterministic (version 5 like) UUID from a hash of the content
+    so that the same entities get the same IDs on each request.
+    """
+
+    digest = sha256(
+        json.dumps(content, sort_keys=True, default=str).encode()
+    ).digest()
+    return format_uuid(digest[:UUID_SIZE], version=5)
+
+
+random_id = RandomIds()
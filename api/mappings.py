@@ -1,9 +1,9 @@
 from abc import ABCMeta, abstractmethod
-from uuid import uuid4
 from flask import current_app
-from collections import defaultdict
 
-from api.utils import all_subclasses, key_error_handler
+from api.ids import content_id, random_id
+from api.timing import timed
+from api.utils import key_error_handler
 
 CTIM_DEFAULTS = {
     'schema_version': '1.0.17',
@@ -11,20 +11,37 @@ CTIM_DEFAULTS = {
 
 
 class Mapping(metaclass=ABCMeta):
+    _registry = {}
 
     def __init__(self, observable):
         self.observable = observable
-        self.unique_feeds = defaultdict(lambda: defaultdict(list))
+        self.confidence_lookup = current_app.config['CONFIDENCE_LOOKUP']
+        self.generate_id = (
+            content_id if current_app.config['CTIM_DETERMINISTIC_IDS']
+            else random_id
+        )
+
+    def __init_subclass__(cls, **kwargs):
+        """Registers subclasses implementing their own `type`."""
+
+        super().__init_subclass__(**kwargs)
+
+        type_ = cls.__dict__.get('type')
+        if type_ is not None and not type_.__isabstractmethod__:
+            Mapping._registry[cls.type()] = cls
 
     @classmethod
     def for_(cls, observable):
         """Returns an instance of `Mapping` for the specified type."""
 
-        for subcls in all_subclasses(Mapping):
-            if subcls.type() == observable['type']:
-                return subcls(observable)
+        subcls = Mapping._registry.get(observable['type'])
+        return subcls(observable) if subcls else None
 
-        return None
+    @classmethod
+    def supports(cls, type_):
+        """Checks whether there is a `Mapping` for the specified type."""
+
+        return type_ in Mapping._registry
 
     @classmethod
     @abstractmethod
@@ -35,14 +52,12 @@ class Mapping(metaclass=ABCMeta):
     def _get_related(self, record):
         """Returns relation depending on an observable and related types."""
 
-    @staticmethod
-    def _map_confidence(confidence):
+    def _map_confidence(self, confidence):
         confidence = int(confidence)
-        for range_ in current_app.config['CONFIDENCE_MAPPING']:
-            if confidence in range_:
-                return current_app.config['CONFIDENCE_MAPPING'][range_]
+        if 0 <= confidence < len(self.confidence_lookup):
+            return self.confidence_lookup[confidence]
 
-    def _sighting(self, record):
+    def _sighting(self, record, index):
         def observed_time():
             start_time = f"{record['reportime'][0]}T00:00:00Z"
             return {
@@ -52,7 +67,8 @@ class Mapping(metaclass=ABCMeta):
 
         return {
             **CTIM_DEFAULTS,
-            'id': f'transient:sighting-{uuid4()}',
+            'id': 'transient:sighting-'
+                  f'{self.generate_id(self.observable, index, record)}',
             'type': 'sighting',
             'source': 'C1fApp',
             'source_uri': max(record['source'][0].split(','), key=len),
@@ -67,7 +83,8 @@ class Mapping(metaclass=ABCMeta):
     def _indicator(self, record):
         return {
             **CTIM_DEFAULTS,
-            'id': f'transient:indicator-{uuid4()}',
+            'id': 'transient:indicator-'
+                  f'{self.generate_id(self.observable, record["feed_label"])}',
             'type': 'indicator',
             'confidence': self._map_confidence(record['confidence'][0]),
             'tlp': 'white',
@@ -78,10 +95,9 @@ class Mapping(metaclass=ABCMeta):
             'title': f'Feed: {record["feed_label"][0]}',
         }
 
-    @staticmethod
-    def _relationship(sighting_id, indicator_id):
+    def _relationship(self, sighting_id, indicator_id):
         return {
-            'id': f'transient:{uuid4()}',
+            'id': f'transient:{self.generate_id(sighting_id, indicator_id)}',
             'source_ref': sighting_id,
             'target_ref': indicator_id,
             'relationship_type': 'member-of',
@@ -89,38 +105,41 @@ class Mapping(metaclass=ABCMeta):
             **CTIM_DEFAULTS
         }
 
+    @timed('mapping')
     @key_error_handler
-    def extract_sightings(self, response_data):
-        result = []
-        for record in response_data:
-            feed_label = record['feed_label'][0]
-            sighting = self._sighting(record)
-            self.unique_feeds[feed_label]['sighting_ids'].append(
-                sighting['id']
-            )
-            result.append(sighting)
-        return result
+    def extract(self, response_data):
+        """
+        Map the records to sightings, indicators (one per feed) and
+        member-of relationships between them in a single pass.
+        """
+
+        sightings = []
+        indicators = []
+        feeds = {}
+
+        for index, record in enumerate(response_data):
+            sighting = self._sighting(record, index)
+            sightings.append(sighting)
 
-    @key_error_handler
-    def extract_indicators(self, response_data):
-        result = []
-        for record in response_data:
             feed_label = record['feed_label'][0]
-            if not self.unique_feeds[feed_label].get('indicator_id'):
+            feed = feeds.get(feed_label)
+            if feed is None:
                 indicator = self._indicator(record)
-                result.append(indicator)
-                self.unique_feeds[feed_label]['indicator_id'] = indicator['id']
-        return result
+                indicators.append(indicator)
+                feed = feeds[feed_label] = indicator['id'], []
 
-    def extract_relationships(self):
-        result = []
-        unique_feeds = self.unique_feeds.keys()
-        for feed in unique_feeds:
-            for sighting_id in self.unique_feeds[feed]['sighting_ids']:
-                indicator_id = self.unique_feeds[feed]['indicator_id']
-                relationship = self._relationship(sighting_id, indicator_id)
-                result.append(relationship)
-        return result
+            indicator_id, feed_relationships = feed
+            feed_relationships.append(
+                self._relationship(sighting['id'], indicator_id)
+            )
+
+        relationships = [
+            relationship
+            for _, feed_relationships in feeds.values()
+            for relationship in feed_relationships
+        ]
+
+        return sightings, indicators, relationships
 
     @staticmethod
     def observable_relation(relation_type, source, related):
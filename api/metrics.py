@@ -0,0 +1,228 @@
+from abc import ABCMeta, abstractmethod
+from bisect import bisect_left
+from threading import Lock
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+
+    def escape(value):
+        return (str(value).replace('\\', '\\\\').replace('\n', '\\n')
+                .replace('"', '\\"'))
+
+    return '{%s}' % ','.join(
+        f'{name}="{escape(value)}"' for name, value in labels
+    )
+
+
+def format_family(name, type_, help_, samples):
+    """
+    Format a metric family in the Prometheus text exposition format, given its
+    samples as (suffix, labels, value) tuples.
+    """
+
+    lines = [f'# HELP {name} {help_}', f'# TYPE {name} {type_}']
+    lines.extend(
+        f'{name}{suffix}{_format_labels(labels)} {_format_value(value)}'
+        for suffix, labels, value in samples
+    )
+    return '\n'.join(lines)
+
+
+class Metric(metaclass=ABCMeta):
+    type_ = None
+
+    def __init__(self, name, help_, labels=()):
+        self.name = name
+        self.help = help_
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = Lock()
+
+    def _key(self, labels):
+        return tuple(labels[name] for name in self.labels)
+
+    @abstractmethod
+    def samples(self):
+        """Return the samples as (suffix, labels, value) tuples."""
+
+    def expose(self):
+        return format_family(self.name, self.type_, self.help, self.samples())
+
+
+class Counter(Metric):
+    type_ = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [('_total', tuple(zip(self.labels, key)), value)
+                for key, value in values]
+
+
+class Histogram(Metric):
+    """
+    Histogram with fixed buckets. Observing a value costs a binary search and
+    an increment, so it is cheap enough for the hot path.
+    """
+
+    type_ = 'histogram'
+
+    def __init__(self, name, help_, buckets, labels=()):
+        super().__init__(name, help_, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # The bucket counts followed by the sum of the values.
+                counts = self._values[key] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    def count(self, **labels):
+        counts = self._values.get(self._key(labels))
+        return sum(counts[:-1]) if counts else 0
+
+    def samples(self):
+        with self._lock:
+            values = sorted(
+                (key, list(counts)) for key, counts in self._values.items()
+            )
+
+        samples = []
+        for key, counts in values:
+            labels = tuple(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append(
+                    ('_bucket', labels + (('le', _format_value(bound)),),
+                     cumulative)
+                )
+            samples.append(('_sum', labels, counts[-1]))
+            samples.append(('_count', labels, cumulative))
+        return samples
+
+
+class Registry:
+    """
+    Metrics of the current process, along with collectors producing the
+    metrics which are only computed on exposition (e.g. cache statistics).
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_, labels=()):
+        return self.register(Counter(name, help_, labels))
+
+    def histogram(self, name, help_, buckets, labels=()):
+        return self.register(Histogram(name, help_, buckets, labels))
+
+    def collector(self, func):
+        """
+        Register a function yielding (name, type, help, samples) tuples of
+        the metric families to format on exposition.
+        """
+
+        self.collectors.append(func)
+        return func
+
+    def expose(self):
+        families = [metric.expose() for metric in self.metrics.values()]
+        for collector in self.collectors:
+            families.extend(
+                format_family(*family) for family in collector()
+            )
+        return '\n'.join(families) + '\n'
+
+
+REGISTRY = Registry()
+
+C1FAPP_REQUEST_DURATION = REGISTRY.histogram(
+    'c1fapp_request_duration_seconds',
+    'Duration of the C1fApp API requests (cache misses only).',
+    (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+C1FAPP_RESPONSE_RECORDS = REGISTRY.histogram(
+    'c1fapp_response_records',
+    'Number of records in the C1fApp API responses.',
+    (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+)
+
+C1FAPP_ERRORS = REGISTRY.counter(
+    'c1fapp_errors',
+    'C1fApp API lookups which failed, by error code.',
+    ('code',)
+)
+
+C1FAPP_RETRIES = REGISTRY.counter(
+    'c1fapp_retries',
+    'C1fApp API requests retried, by reason.',
+    ('reason',)
+)
+
+C1FAPP_RATE_LIMITED = REGISTRY.counter(
+    'c1fapp_rate_limited',
+    'C1fApp API requests which had to wait for (queued) or were denied '
+    '(rejected) a token of the rate limit of their API key.',
+    ('outcome',)
+)
+
+C1FAPP_RATE_LIMIT_WAIT = REGISTRY.histogram(
+    'c1fapp_rate_limit_wait_seconds',
+    'Time the queued C1fApp API requests waited for the rate limit.',
+    (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+
+C1FAPP_CIRCUIT_REJECTED = REGISTRY.counter(
+    'c1fapp_circuit_rejected',
+    'C1fApp API lookups failed fast while the circuit breaker was open.'
+)
+
+RELAY_REQUESTS = REGISTRY.counter(
+    'relay_requests',
+    'Requests handled by the relay, by endpoint and HTTP status.',
+    ('endpoint', 'status')
+)
+
+RELAY_OBSERVABLES = REGISTRY.counter(
+    'relay_observables',
+    'Observables requested to be enriched, by type.',
+    ('type',)
+)
+
+RELAY_ENTITIES = REGISTRY.counter(
+    'relay_entities',
+    'CTIM entities sent in responses, by type.',
+    ('type',)
+)
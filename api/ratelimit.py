@@ -0,0 +1,145 @@
+import sqlite3
+from abc import ABCMeta, abstractmethod
+from threading import Lock
+from time import monotonic, time
+
+
+class TokenBucket(metaclass=ABCMeta):
+    """
+    Token buckets (one per key) refilled at `rate` tokens per second up to
+    `burst` tokens.
+
+    Taking a token reserves it right away, even if the bucket is empty, so
+    that concurrent callers queue up in order: each one is told how long to
+    wait before using its token instead of polling for it.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def take(self, key, max_wait):
+        """
+        Take a token from the bucket of the key and return the number of
+        seconds to wait before using it, or `None` (and take nothing) if that
+        would be longer than `max_wait`.
+        """
+
+        if not self.enabled:
+            return 0
+
+        return self._take(key, max_wait)
+
+    def _reserve(self, tokens, updated_at, now, max_wait):
+        """
+        Refill the tokens left at `updated_at` and reserve one of them.
+        Return the tokens left along with the time to wait (or `None`).
+        """
+
+        tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+        wait = max(1 - tokens, 0) / self.rate
+
+        if wait > max_wait:
+            return tokens, None
+
+        return tokens - 1, wait
+
+    @abstractmethod
+    def _take(self, key, max_wait):
+        """Take a token from the bucket of the key (see `take`)."""
+
+
+class MemoryTokenBucket(TokenBucket):
+    """Token buckets shared by the threads of the current process."""
+
+    # Full buckets are dropped once there are more than that many of them.
+    MAX_BUCKETS = 1024
+
+    def __init__(self, rate, burst):
+        super().__init__(rate, burst)
+        self._buckets = {}
+        self._lock = Lock()
+
+    def _take(self, key, max_wait):
+        now = monotonic()
+
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (self.burst, now))
+            tokens, wait = self._reserve(tokens, updated_at, now, max_wait)
+            self._buckets[key] = tokens, now
+
+            if len(self._buckets) > self.MAX_BUCKETS:
+                self._prune(now)
+
+        return wait
+
+    def _prune(self, now):
+        for key, (tokens, updated_at) in list(self._buckets.items()):
+            if tokens + (now - updated_at) * self.rate >= self.burst:
+                del self._buckets[key]
+
+
+class SQLiteTokenBucket(TokenBucket):
+    """
+    Token buckets stored in a local SQLite file, so that all the processes on
+    a host share the same buckets. Each token is taken in an exclusive
+    transaction.
+    """
+
+    def __init__(self, path, rate, burst, namespace='c1fapp'):
+        super().__init__(rate, burst)
+        self.table = f'rate_limit_{namespace}'
+        self._lock = Lock()
+        self._connection = sqlite3.connect(
+            path, timeout=5, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute(
+            f'CREATE TABLE IF NOT EXISTS {self.table} ('
+            'key TEXT PRIMARY KEY, tokens REAL NOT NULL, '
+            'updated_at REAL NOT NULL)'
+        )
+
+    def _take(self, key, max_wait):
+        with self._lock:
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                now = time()
+                row = self._connection.execute(
+                    f'SELECT tokens, updated_at FROM {self.table} '
+                    'WHERE key = ?', (key,)
+                ).fetchone()
+                tokens, updated_at = row or (self.burst, now)
+
+                tokens, wait = self._reserve(
+                    tokens, updated_at, now, max_wait
+                )
+                self._connection.execute(
+                    f'INSERT OR REPLACE INTO {self.table} '
+                    '(key, tokens, updated_at) VALUES (?, ?, ?)',
+                    (key, tokens, now)
+                )
+            except BaseException:
+                self._connection.execute('ROLLBACK')
+                raise
+            else:
+                self._connection.execute('COMMIT')
+
+        return wait
+
+
+def create_token_bucket(config, namespace='c1fapp'):
+    """Create token buckets using the backend selected in the configuration."""
+
+    rate = config['C1FAPP_RATE_LIMIT']
+    burst = config['C1FAPP_RATE_LIMIT_BURST']
+
+    if config['C1FAPP_RATE_LIMIT_BACKEND'] == 'sqlite':
+        return SQLiteTokenBucket(
+            config['C1FAPP_RATE_LIMIT_SQLITE_PATH'], rate, burst, namespace
+        )
+
+    return MemoryTokenBucket(rate, burst)
@@ -0,0 +1,115 @@
+import codecs
+import json
+from heapq import heappush, heappushpop
+
+CHUNK_SIZE = 64 * 1024
+
+# The only fields of C1fApp records used by `api.mappings`.
+RECORD_FIELDS = (
+    'address',
+    'assessment',
+    'confidence',
+    'domain',
+    'feed_label',
+    'ip_address',
+    'reportime',
+    'source',
+)
+
+_WHITESPACE = ' \t\n\r'
+
+
+def iter_text(response, chunk_size=CHUNK_SIZE):
+    """Decode the body of a streamed response chunk by chunk."""
+
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(
+        errors='replace'
+    )
+    for chunk in response.iter_content(chunk_size):
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+def iter_json_array(chunks):
+    """
+    Incrementally decode the items of a top-level JSON array split into
+    arbitrary text chunks, so that only a single item is held in memory.
+    """
+
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = finished = False
+
+    for chunk in chunks:
+        buffer += chunk
+        position = 0
+
+        while True:
+            while position < len(buffer) and (
+                    buffer[position] in _WHITESPACE or
+                    started and buffer[position] == ','
+            ):
+                position += 1
+
+            if position == len(buffer) or finished:
+                break
+
+            if not started:
+                if buffer[position] != '[':
+                    raise ValueError('Expected a JSON array.')
+                started = True
+                position += 1
+                continue
+
+            if buffer[position] == ']':
+                finished = True
+                position += 1
+                break
+
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The item is not complete yet.
+                break
+
+            if end == len(buffer):
+                # A number might continue in the next chunk.
+                break
+
+            yield item
+            position = end
+
+        buffer = buffer[position:]
+
+    if not finished:
+        raise ValueError('Unexpected end of a JSON array.')
+
+
+def prune(records, fields=RECORD_FIELDS):
+    """Drop the fields of the records not used by the mappings."""
+
+    for record in records:
+        yield {field: record[field] for field in fields if field in record}
+
+
+def top_records(records, limit):
+    """
+    Keep a running selection of up to `limit` most recently reported records
+    and return them newest first, in the same order as `latest_records`.
+    """
+
+    heap = []
+
+    for index, record in enumerate(records):
+        # The negated index keeps the earlier of the equally recent records.
+        entry = record['reportime'], -index, record
+        if len(heap) < limit:
+            heappush(heap, entry)
+        elif limit:
+            heappushpop(heap, entry)
+
+    return [record for _, _, record in sorted(heap, reverse=True)]
@@ -0,0 +1,129 @@
+import json
+from contextlib import contextmanager
+from functools import wraps
+from threading import Lock
+from time import perf_counter
+
+from flask import g
+
+# The phases reported in the order they usually happen in.
+PHASES = ('jwt', 'validation', 'upstream', 'mapping', 'serialization')
+
+# Caps the per-observable upstream timings sent in the `Server-Timing` header
+# (the log always has all of them) to keep the header reasonably small.
+SERVER_TIMING_MAX_LOOKUPS = 50
+
+# Caps the observables described in the header as well, since URLs may be
+# kilobytes long.
+SERVER_TIMING_MAX_DESCRIPTION = 64
+
+
+def _description(text, max_length=SERVER_TIMING_MAX_DESCRIPTION):
+    """
+    Make the text safe to be sent as a quoted header parameter, truncated to
+    `max_length` characters.
+    """
+
+    if len(text) > max_length:
+        text = text[:max_length - 3] + '...'
+
+    text = ''.join(
+        character if ' ' <= character <= '~' else '?' for character in text
+    )
+    return text.replace('\\', '\\\\').replace('"', '\\"')
+
+
+class Timings:
+    """
+    Durations of the phases of handling a single request.
+
+    Upstream lookups are also recorded one by one (they run concurrently, so
+    the total of the `upstream` phase is summed across the threads).
+    """
+
+    def __init__(self):
+        self.started_at = perf_counter()
+        self.phases = {}
+        self.lookups = []
+        self._lock = Lock()
+
+    def add(self, phase, seconds, observable=None):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0) + seconds
+            if observable is not None:
+                self.lookups.append((observable, seconds))
+
+    @contextmanager
+    def measure(self, phase, observable=None):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, perf_counter() - start, observable)
+
+    def total(self):
+        return perf_counter() - self.started_at
+
+    def header(self):
+        """Format the timings as a `Server-Timing` header value."""
+
+        with self._lock:
+            phases = sorted(
+                self.phases.items(),
+                key=lambda item: (PHASES + (item[0],)).index(item[0])
+            )
+            lookups = self.lookups[:SERVER_TIMING_MAX_LOOKUPS]
+
+        metrics = [f'{phase};dur={seconds * 1000:.2f}'
+                   for phase, seconds in phases]
+        metrics.extend(
+            f'upstream-{index};desc="{_description(observable)}";'
+            f'dur={seconds * 1000:.2f}'
+            for index, (observable, seconds) in enumerate(lookups, 1)
+        )
+        metrics.append(f'total;dur={self.total() * 1000:.2f}')
+
+        return ', '.join(metrics)
+
+    def fields(self):
+        """Return the timings (in milliseconds) as structured log fields."""
+
+        with self._lock:
+            return {
+                'duration_ms': round(self.total() * 1000, 3),
+                'phases_ms': {
+                    phase: round(seconds * 1000, 3)
+                    for phase, seconds in self.phases.items()
+                },
+                'upstream_ms': [
+                    {'observable': observable,
+                     'duration_ms': round(seconds * 1000, 3)}
+                    for observable, seconds in self.lookups
+                ],
+            }
+
+    def log(self, logger, **fields):
+        logger.info(json.dumps({'event': 'timings', **fields,
+                                **self.fields()}))
+
+
+def get_timings():
+    """Return the timings of the current request (or app context)."""
+
+    if 'timings' not in g:
+        g.timings = Timings()
+
+    return g.timings
+
+
+def timed(phase):
+    """Add the duration of each call of the function to the phase."""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_timings().measure(phase):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
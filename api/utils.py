@@ -1,23 +1,100 @@
+import json
+from hashlib import sha256
+from heapq import nlargest
+from tempfile import SpooledTemporaryFile
+from threading import Lock
+from time import time
+
 from authlib.jose import jwt
 from authlib.jose.errors import JoseError
-from flask import request, current_app, jsonify, g
-from api.errors import InvalidJWTError, InvalidArgumentError, C1fAppKeyError
+from flask import request, current_app, g, stream_with_context
+from api.cache import MemoryCache
+from api.errors import (
+    InvalidJWTError, InvalidArgumentError, C1fAppKeyError, TRFormattedError
+)
+from api.timing import timed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_jwt_cache = None
+_jwt_cache_lock = Lock()
+
+
+def get_jwt_cache():
+    """Return the process-wide cache of verified JWT claims."""
+
+    global _jwt_cache
+
+    with _jwt_cache_lock:
+        if _jwt_cache is None:
+            _jwt_cache = MemoryCache(
+                current_app.config['JWT_CACHE_TTL'],
+                current_app.config['JWT_CACHE_MAX_ENTRIES']
+            )
+
+        return _jwt_cache
 
 
+def jwt_cache_key(secret_key, token):
+    """
+    Build a cache key from the digests of both the token and the secret key,
+    so that changing the secret key invalidates all the cached claims.
+    """
+
+    return ':'.join(
+        sha256(value.encode()).hexdigest() for value in (secret_key, token)
+    )
+
+
+def claims_ttl(claims, ttl):
+    """
+    Return for how long the claims may be cached: no longer than `ttl` and
+    until the token expires, and not at all if the token is not valid yet.
+    """
+
+    now = time()
+
+    try:
+        if float(claims.get('nbf', now)) > now:
+            return 0
+        if 'exp' in claims:
+            ttl = min(ttl, float(claims['exp']) - now)
+    except (TypeError, ValueError):
+        return 0
+
+    return max(ttl, 0)
+
+
+@timed('jwt')
 def get_jwt():
     """
     Parse the incoming request's Authorization Bearer JWT for some credentials.
     Validate its signature against the application's secret key.
+    Reuse the claims of the tokens verified recently.
     """
 
     try:
         scheme, token = request.headers['Authorization'].split()
         assert scheme.lower() == 'bearer'
-        return jwt.decode(token, current_app.config['SECRET_KEY'])
+
+        secret_key = current_app.config['SECRET_KEY']
+        cache = get_jwt_cache()
+        key = jwt_cache_key(secret_key, token)
+
+        claims = cache.get(key)
+        if claims is None:
+            claims = dict(jwt.decode(token, secret_key))
+            cache.set(key, claims, ttl=claims_ttl(claims, cache.ttl))
+
+        return dict(claims)
     except (KeyError, ValueError, AssertionError, JoseError):
         raise InvalidJWTError
 
 
+@timed('validation')
 def get_json(schema):
     """
     Parse the incoming request's data as JSON.
@@ -34,6 +111,41 @@ def get_json(schema):
     return data
 
 
+def dumps(data):
+    """
+    Serialize the data to compact UTF-8 JSON with sorted keys.
+
+    Uses orjson when it is installed and falls back to the standard library
+    otherwise (or for data orjson does not support, e.g. non-string keys).
+    Both produce the same bytes for strings, integers, booleans, nulls, lists
+    and string-keyed objects, i.e. everything the relay responds with.
+    """
+
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            pass
+
+    return json.dumps(
+        data, ensure_ascii=False, separators=(',', ':'), sort_keys=True
+    ).encode('utf-8')
+
+
+def jsonify(data):
+    """
+    Respond with the data serialized by `dumps`.
+
+    Matches the output of `flask.jsonify` (compact, sorted keys, a trailing
+    newline) except that non-ASCII characters are sent as UTF-8 instead of
+    being escaped as `\\uXXXX`, which parses to the same data.
+    """
+
+    return current_app.response_class(
+        dumps(data) + b'\n', mimetype='application/json'
+    )
+
+
 def jsonify_data(data):
     return jsonify({'data': data})
 
@@ -42,18 +154,33 @@ def jsonify_errors(error):
     return jsonify({'errors': [error]})
 
 
-def all_subclasses(cls):
+def remove_duplicates(observables):
     """
-    Retrieve set of class subclasses recursively.
+    Remove the repeated observables preserving the order of the first ones.
     """
-    subclasses = set(cls.__subclasses__())
-    return subclasses.union(s for c in subclasses for s in all_subclasses(c))
+    unique = {}
+    for observable in observables:
+        key = observable['type'], observable['value']
+        unique.setdefault(key, observable)
+    return list(unique.values())
+
+
+def latest_records(records, limit):
+    """
+    Select up to `limit` most recently reported records (newest first).
+
+    Equivalent to sorting the records by `reportime` in descending order and
+    taking the first `limit` ones, but costs O(n log k) and never copies the
+    whole list.
+    """
+    return nlargest(limit, records, key=lambda x: x['reportime'])
 
 
 def format_docs(docs):
     return {'count': len(docs), 'docs': docs}
 
 
+@timed('serialization')
 def jsonify_result():
     result = {'data': {}}
 
@@ -73,6 +200,87 @@ def jsonify_result():
     return jsonify(result)
 
 
+STREAM_SPOOL_SIZE = 1024 * 1024
+
+
+def stream_result(bundles):
+    """
+    Stream the same envelope as `jsonify_result` while the bundles of
+    (sightings, indicators, relationships) are being produced.
+
+    Sightings are sent right away, while indicators and relationships are
+    serialized into temporary files (kept in memory until they grow large)
+    and sent afterwards, so no section is ever held in memory as a whole.
+    The `count` of each section follows its `docs`.
+    """
+
+    def section(name, docs, count):
+        yield b'"%s":{"docs":[' % name.encode()
+        yield from docs
+        yield b'],"count":%d}' % count
+
+    def spooled(spool):
+        spool.seek(0)
+        yield from iter(lambda: spool.read(STREAM_SPOOL_SIZE), b'')
+
+    def generate():
+        counts = {'sightings': 0, 'indicators': 0, 'relationships': 0}
+        spools = {
+            name: SpooledTemporaryFile(max_size=STREAM_SPOOL_SIZE)
+            for name in ('indicators', 'relationships')
+        }
+        errors = []
+        opened = False
+
+        def docs(bundles):
+            nonlocal opened
+            try:
+                for sightings, indicators, relationships in bundles:
+                    for sighting in sightings:
+                        if not counts['sightings']:
+                            opened = True
+                            yield b'{"data":{"sightings":{"docs":['
+                        else:
+                            yield b','
+                        counts['sightings'] += 1
+                        yield dumps(sighting)
+
+                    for name, entities in (('indicators', indicators),
+                                           ('relationships', relationships)):
+                        for entity in entities:
+                            if counts[name]:
+                                spools[name].write(b',')
+                            counts[name] += 1
+                            spools[name].write(dumps(entity))
+            except TRFormattedError as error:
+                errors.append(error.json)
+
+        with spools['indicators'], spools['relationships']:
+            yield from docs(bundles)
+
+            if opened:
+                yield b'],"count":%d}' % counts['sightings']
+
+            for name, spool in spools.items():
+                if counts[name]:
+                    yield b',' if opened else b'{"data":{'
+                    opened = True
+                    yield from section(name, spooled(spool), counts[name])
+
+        errors = g.get('errors', []) + errors
+
+        if opened:
+            yield b'}'
+        if errors:
+            yield b',' if opened else b'{'
+            yield b'"errors":' + dumps(errors)
+        yield b'}' if opened or errors else b'{}'
+
+    return current_app.response_class(
+        stream_with_context(generate()), mimetype='application/json'
+    )
+
+
 def key_error_handler(func):
     def wrapper(*args, **kwargs):
         try:
@@ -1,11 +1,13 @@
-from flask import Flask, jsonify, g
+from flask import Flask, g, request
 
 from api.enrich import enrich_api
 from api.health import health_api
 from api.respond import respond_api
 
 from api.errors import TRFormattedError
-from api.utils import jsonify_result
+from api.metrics import RELAY_REQUESTS
+from api.timing import Timings, get_timings
+from api.utils import jsonify, jsonify_result
 
 app = Flask(__name__)
 
@@ -17,6 +19,41 @@ app.register_blueprint(enrich_api)
 app.register_blueprint(respond_api)
 
 
+@app.before_request
+def start_timings():
+    g.timings = Timings()
+
+
+@app.after_request
+def report_timings(response):
+    """
+    Send the timings so far in the `Server-Timing` header and log all of them
+    once the response is over (i.e. a streamed one has been sent).
+    """
+
+    timings = get_timings()
+    logger = app.logger
+    fields = {
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+    }
+
+    response.headers['Server-Timing'] = timings.header()
+    response.call_on_close(lambda: timings.log(logger, **fields))
+
+    return response
+
+
+@app.after_request
+def count_request(response):
+    RELAY_REQUESTS.inc(
+        endpoint=request.url_rule.rule if request.url_rule else 'unknown',
+        status=response.status_code
+    )
+    return response
+
+
 @app.errorhandler(Exception)
 def handle_error(exception):
     code = getattr(exception, 'code', 500)
@@ -26,7 +63,7 @@ def handle_error(exception):
         exception.__class__.__name__,
     ])
 
-    response = jsonify(code=code, message=message, reason=reason)
+    response = jsonify({'code': code, 'message': message, 'reason': reason})
     return response, code
 
 
@@ -2,6 +2,38 @@ import os
 
 from version import VERSION
 
+CONFIDENCE_MIN = 0
+CONFIDENCE_MAX = 100
+
+
+def compile_confidence_mapping(mapping):
+    """
+    Turn the mapping of confidence ranges to levels into a tuple indexed by
+    confidence. The ranges must cover 0-100 without overlapping.
+    """
+
+    lookup = [None] * (CONFIDENCE_MAX - CONFIDENCE_MIN + 1)
+
+    for range_, level in mapping.items():
+        for confidence in range_:
+            if not CONFIDENCE_MIN <= confidence <= CONFIDENCE_MAX:
+                raise ValueError(
+                    f'Confidence {confidence} from {range_} is out of '
+                    f'{CONFIDENCE_MIN}-{CONFIDENCE_MAX}.'
+                )
+            if lookup[confidence] is not None:
+                raise ValueError(
+                    f'Confidence {confidence} from {range_} is mapped twice.'
+                )
+            lookup[confidence] = level
+
+    missing = [confidence for confidence, level in enumerate(lookup)
+               if level is None]
+    if missing:
+        raise ValueError(f'Confidence {missing[0]} is not mapped.')
+
+    return tuple(lookup)
+
 
 class Config:
     VERSION = VERSION
@@ -16,7 +48,7 @@ class Config:
     USER_AGENT = ('Cisco Threat Response Integrations '
                   '<tr-integrations-support@cisco.com>')
 
-    API_URL = 'https://www.c1fapp.com/cifapp/api/'
+    API_URL = os.environ.get('API_URL', 'https://www.c1fapp.com/cifapp/api/')
 
     CONFIDENCE_MAPPING = {
      range(26): 'Low',
@@ -24,6 +56,8 @@ class Config:
      range(80, 101): 'High'
     }
 
+    CONFIDENCE_LOOKUP = compile_confidence_mapping(CONFIDENCE_MAPPING)
+
     CTR_ENTITIES_LIMIT_DEFAULT = 100
     CTR_ENTITIES_LIMIT_MAX = 1000
 
@@ -35,3 +69,230 @@ class Config:
 
     if CTR_ENTITIES_LIMIT > CTR_ENTITIES_LIMIT_MAX:
         CTR_ENTITIES_LIMIT = CTR_ENTITIES_LIMIT_MAX
+
+    C1FAPP_MAX_WORKERS_DEFAULT = 10
+
+    try:
+        C1FAPP_MAX_WORKERS = int(os.environ['C1FAPP_MAX_WORKERS'])
+        assert C1FAPP_MAX_WORKERS > 0
+    except (KeyError, ValueError, AssertionError):
+        C1FAPP_MAX_WORKERS = C1FAPP_MAX_WORKERS_DEFAULT
+
+    C1FAPP_ADAPTIVE_CONCURRENCY = os.environ.get(
+        'C1FAPP_ADAPTIVE_CONCURRENCY', 'true'
+    ).lower() not in ('0', 'false', 'no')
+
+    C1FAPP_MAX_CONCURRENCY_DEFAULT = 30
+
+    try:
+        C1FAPP_MAX_CONCURRENCY = int(os.environ['C1FAPP_MAX_CONCURRENCY'])
+        assert C1FAPP_MAX_CONCURRENCY > 0
+    except (KeyError, ValueError, AssertionError):
+        C1FAPP_MAX_CONCURRENCY = C1FAPP_MAX_CONCURRENCY_DEFAULT
+
+    C1FAPP_POOL_SIZE_DEFAULT = 10
+
+    try:
+        C1FAPP_POOL_SIZE = int(os.environ['C1FAPP_POOL_SIZE'])
+        assert C1FAPP_POOL_SIZE > 0
+    except (KeyError, ValueError, AssertionError):
+        C1FAPP_POOL_SIZE = C1FAPP_POOL_SIZE_DEFAULT
+
+    C1FAPP_DEADLINE_DEFAULT = 25
+
+    try:
+        C1FAPP_DEADLINE = float(os.environ['C1FAPP_DEADLINE'])
+        assert C1FAPP_DEADLINE > 0
+    except (KeyError, ValueError, AssertionError):
+        C1FAPP_DEADLINE = C1FAPP_DEADLINE_DEFAULT
+
+    C1FAPP_CONNECT_TIMEOUT_DEFAULT = 5
+
+    try:
+        C1FAPP_CONNECT_TIMEOUT = float(os.environ['C1FAPP_CONNECT_TIMEOUT'])
+        assert C1FAPP_CONNECT_TIMEOUT > 0
+    except (KeyError, ValueError, AssertionError):
+        C1FAPP_CONNECT_TIMEOUT = C1FAPP_CONNECT_TIMEOUT_DEFAULT
+
+    C1FAPP_RETRIES_DEFAULT = 2
+
+    try:
+        C1FAPP_RETRIES = int(os.environ['C1FAPP_RETRIES'])
+        assert C1FAPP_RETRIES >= 0
+    except (KeyError, ValueError, AssertionError):
+        C1FAPP_RETRIES = C1FAPP_RETRIES_DEFAULT
+
+    C1FAPP_RETRY_BACKOFF_DEFAULT = 0.5
+
+    try:
+        C1FAPP_RETRY_BACKOFF = float(os.environ['C1FAPP_RETRY_BACKOFF'])
+        assert C1FAPP_RETRY_BACKOFF >= 0
+    except (KeyError, ValueError, AssertionError):
+        C1FAPP_RETRY_BACKOFF = C1FAPP_RETRY_BACKOFF_DEFAULT
+
+    C1FAPP_RATE_LIMIT_DEFAULT = 0
+
+    try:
+        C1FAPP_RATE_LIMIT = float(os.environ['C1FAPP_RATE_LIMIT'])
+        assert C1FAPP_RATE_LIMIT >= 0
+    except (KeyError, ValueError, AssertionError):
+        C1FAPP_RATE_LIMIT = C1FAPP_RATE_LIMIT_DEFAULT
+
+    C1FAPP_RATE_LIMIT_BURST_DEFAULT = 10
+
+    try:
+        C1FAPP_RATE_LIMIT_BURST = int(os.environ['C1FAPP_RATE_LIMIT_BURST'])
+        assert C1FAPP_RATE_LIMIT_BURST > 0
+    except (KeyError, ValueError, AssertionError):
+        C1FAPP_RATE_LIMIT_BURST = C1FAPP_RATE_LIMIT_BURST_DEFAULT
+
+    C1FAPP_RATE_LIMIT_MAX_WAIT_DEFAULT = 5
+
+    try:
+        C1FAPP_RATE_LIMIT_MAX_WAIT = float(
+            os.environ['C1FAPP_RATE_LIMIT_MAX_WAIT']
+        )
+        assert C1FAPP_RATE_LIMIT_MAX_WAIT >= 0
+    except (KeyError, ValueError, AssertionError):
+        C1FAPP_RATE_LIMIT_MAX_WAIT = C1FAPP_RATE_LIMIT_MAX_WAIT_DEFAULT
+
+    C1FAPP_RATE_LIMIT_BACKENDS = ('memory', 'sqlite')
+    C1FAPP_RATE_LIMIT_BACKEND_DEFAULT = 'memory'
+
+    C1FAPP_RATE_LIMIT_BACKEND = os.environ.get(
+        'C1FAPP_RATE_LIMIT_BACKEND', C1FAPP_RATE_LIMIT_BACKEND_DEFAULT
+    ).lower()
+
+    if C1FAPP_RATE_LIMIT_BACKEND not in C1FAPP_RATE_LIMIT_BACKENDS:
+        C1FAPP_RATE_LIMIT_BACKEND = C1FAPP_RATE_LIMIT_BACKEND_DEFAULT
+
+    C1FAPP_RATE_LIMIT_SQLITE_PATH = os.environ.get(
+        'C1FAPP_RATE_LIMIT_SQLITE_PATH', '/tmp/c1fapp-rate-limit.sqlite3'
+    )
+
+    C1FAPP_CIRCUIT_BREAKER = os.environ.get(
+        'C1FAPP_CIRCUIT_BREAKER', 'true'
+    ).lower() not in ('0', 'false', 'no')
+
+    C1FAPP_CIRCUIT_FAILURE_RATE_DEFAULT = 0.5
+
+    try:
+        C1FAPP_CIRCUIT_FAILURE_RATE = float(
+            os.environ['C1FAPP_CIRCUIT_FAILURE_RATE']
+        )
+        assert 0 < C1FAPP_CIRCUIT_FAILURE_RATE <= 1
+    except (KeyError, ValueError, AssertionError):
+        C1FAPP_CIRCUIT_FAILURE_RATE = C1FAPP_CIRCUIT_FAILURE_RATE_DEFAULT
+
+    C1FAPP_CIRCUIT_MIN_LOOKUPS_DEFAULT = 10
+
+    try:
+        C1FAPP_CIRCUIT_MIN_LOOKUPS = int(
+            os.environ['C1FAPP_CIRCUIT_MIN_LOOKUPS']
+        )
+        assert C1FAPP_CIRCUIT_MIN_LOOKUPS > 0
+    except (KeyError, ValueError, AssertionError):
+        C1FAPP_CIRCUIT_MIN_LOOKUPS = C1FAPP_CIRCUIT_MIN_LOOKUPS_DEFAULT
+
+    C1FAPP_CIRCUIT_WINDOW_DEFAULT = 60
+
+    try:
+        C1FAPP_CIRCUIT_WINDOW = float(os.environ['C1FAPP_CIRCUIT_WINDOW'])
+        assert C1FAPP_CIRCUIT_WINDOW > 0
+    except (KeyError, ValueError, AssertionError):
+        C1FAPP_CIRCUIT_WINDOW = C1FAPP_CIRCUIT_WINDOW_DEFAULT
+
+    C1FAPP_CIRCUIT_OPEN_FOR_DEFAULT = 30
+
+    try:
+        C1FAPP_CIRCUIT_OPEN_FOR = float(os.environ['C1FAPP_CIRCUIT_OPEN_FOR'])
+        assert C1FAPP_CIRCUIT_OPEN_FOR > 0
+    except (KeyError, ValueError, AssertionError):
+        C1FAPP_CIRCUIT_OPEN_FOR = C1FAPP_CIRCUIT_OPEN_FOR_DEFAULT
+
+    C1FAPP_KEEP_ALIVE = os.environ.get(
+        'C1FAPP_KEEP_ALIVE', 'true'
+    ).lower() not in ('0', 'false', 'no')
+
+    C1FAPP_CACHE_TTL_DEFAULT = 300
+
+    try:
+        C1FAPP_CACHE_TTL = int(os.environ['C1FAPP_CACHE_TTL'])
+        assert C1FAPP_CACHE_TTL >= 0
+    except (KeyError, ValueError, AssertionError):
+        C1FAPP_CACHE_TTL = C1FAPP_CACHE_TTL_DEFAULT
+
+    C1FAPP_CACHE_MAX_ENTRIES_DEFAULT = 1024
+
+    try:
+        C1FAPP_CACHE_MAX_ENTRIES = int(os.environ['C1FAPP_CACHE_MAX_ENTRIES'])
+        assert C1FAPP_CACHE_MAX_ENTRIES >= 0
+    except (KeyError, ValueError, AssertionError):
+        C1FAPP_CACHE_MAX_ENTRIES = C1FAPP_CACHE_MAX_ENTRIES_DEFAULT
+
+    C1FAPP_NEGATIVE_CACHE_TTL_DEFAULT = 60
+
+    try:
+        C1FAPP_NEGATIVE_CACHE_TTL = int(
+            os.environ['C1FAPP_NEGATIVE_CACHE_TTL']
+        )
+        assert C1FAPP_NEGATIVE_CACHE_TTL >= 0
+    except (KeyError, ValueError, AssertionError):
+        C1FAPP_NEGATIVE_CACHE_TTL = C1FAPP_NEGATIVE_CACHE_TTL_DEFAULT
+
+    C1FAPP_NEGATIVE_CACHE_MAX_ENTRIES_DEFAULT = 4096
+
+    try:
+        C1FAPP_NEGATIVE_CACHE_MAX_ENTRIES = int(
+            os.environ['C1FAPP_NEGATIVE_CACHE_MAX_ENTRIES']
+        )
+        assert C1FAPP_NEGATIVE_CACHE_MAX_ENTRIES >= 0
+    except (KeyError, ValueError, AssertionError):
+        C1FAPP_NEGATIVE_CACHE_MAX_ENTRIES = \
+            C1FAPP_NEGATIVE_CACHE_MAX_ENTRIES_DEFAULT
+
+    C1FAPP_CACHE_BACKENDS = ('memory', 'sqlite', 'redis')
+    C1FAPP_CACHE_BACKEND_DEFAULT = 'memory'
+
+    C1FAPP_CACHE_BACKEND = os.environ.get(
+        'C1FAPP_CACHE_BACKEND', C1FAPP_CACHE_BACKEND_DEFAULT
+    ).lower()
+
+    if C1FAPP_CACHE_BACKEND not in C1FAPP_CACHE_BACKENDS:
+        C1FAPP_CACHE_BACKEND = C1FAPP_CACHE_BACKEND_DEFAULT
+
+    C1FAPP_CACHE_SQLITE_PATH = os.environ.get(
+        'C1FAPP_CACHE_SQLITE_PATH', '/tmp/c1fapp-cache.sqlite3'
+    )
+
+    C1FAPP_CACHE_REDIS_URL = os.environ.get(
+        'C1FAPP_CACHE_REDIS_URL', 'redis://localhost:6379/0'
+    )
+
+    C1FAPP_STREAM_RESPONSES = os.environ.get(
+        'C1FAPP_STREAM_RESPONSES', 'false'
+    ).lower() in ('1', 'true', 'yes')
+
+    CTIM_DETERMINISTIC_IDS = os.environ.get(
+        'CTIM_DETERMINISTIC_IDS', 'false'
+    ).lower() in ('1', 'true', 'yes')
+
+    CTR_STREAM_RESPONSES = os.environ.get(
+        'CTR_STREAM_RESPONSES', 'false'
+    ).lower() in ('1', 'true', 'yes')
+
+    JWT_CACHE_TTL_DEFAULT = 600
+
+    try:
+        JWT_CACHE_TTL = int(os.environ['JWT_CACHE_TTL'])
+        assert JWT_CACHE_TTL >= 0
+    except (KeyError, ValueError, AssertionError):
+        JWT_CACHE_TTL = JWT_CACHE_TTL_DEFAULT
+
+    JWT_CACHE_MAX_ENTRIES_DEFAULT = 256
+
+    try:
+        JWT_CACHE_MAX_ENTRIES = int(os.environ['JWT_CACHE_MAX_ENTRIES'])
+        assert JWT_CACHE_MAX_ENTRIES >= 0
+    except (KeyError, ValueError, AssertionError):
+        JWT_CACHE_MAX_ENTRIES = JWT_CACHE_MAX_ENTRIES_DEFAULT
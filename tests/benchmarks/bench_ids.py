@@ -0,0 +1,37 @@
+"""
+Compare generating transient CTIM entity IDs with `uuid4` against the
+batched and the deterministic generators from `api.ids`.
+
+Usage: python -m tests.benchmarks.bench_ids
+"""
+from timeit import Timer
+from uuid import uuid4
+
+from api.ids import RandomIds, content_id
+
+COUNT = 2000
+
+OBSERVABLE = {'type': 'domain', 'value': 'onedrive.live.com'}
+
+
+def main():
+    random_id = RandomIds()
+
+    generators = (
+        ('uuid4', lambda index: str(uuid4())),
+        ('batched', lambda index: random_id()),
+        ('content', lambda index: content_id(OBSERVABLE, index)),
+    )
+
+    print(f'{"generator":>10} {"us/id":>8} {"ms/" + str(COUNT) + " ids":>12}')
+
+    for name, generate_id in generators:
+        timer = Timer(lambda: [generate_id(index) for index in range(COUNT)])
+        number, _ = timer.autorange()
+        seconds = min(timer.repeat(repeat=5, number=number)) / number
+        print(f'{name:>10} {seconds / COUNT * 1e6:>8.2f} '
+              f'{seconds * 1000:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
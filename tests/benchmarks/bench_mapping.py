@@ -0,0 +1,122 @@
+"""
+Compare the single-pass `Mapping.extract` with the former three-pass
+extraction (`extract_sightings`, `extract_indicators` and
+`extract_relationships` sharing a nested `defaultdict`).
+
+Usage: python -m tests.benchmarks.bench_mapping
+"""
+import random
+import tracemalloc
+from collections import defaultdict
+from time import perf_counter
+
+from api.mappings import Domain
+from app import app
+
+SIZES = (100, 1000, 10000)
+FEEDS = 20
+
+
+class LegacyExtraction:
+    """
+    The former three-pass extraction. It builds the entities with a `Domain`
+    instead of subclassing it, so that it never takes part in the dispatch of
+    `Mapping.for_`, even when imported by the tests.
+    """
+
+    def __init__(self, observable):
+        self.mapping = Domain(observable)
+        self.unique_feeds = defaultdict(lambda: defaultdict(list))
+
+    def extract(self, response_data):
+        return (self.extract_sightings(response_data),
+                self.extract_indicators(response_data),
+                self.extract_relationships())
+
+    def extract_sightings(self, response_data):
+        result = []
+        for index, record in enumerate(response_data):
+            feed_label = record['feed_label'][0]
+            sighting = self.mapping._sighting(record, index)
+            self.unique_feeds[feed_label]['sighting_ids'].append(
+                sighting['id']
+            )
+            result.append(sighting)
+        return result
+
+    def extract_indicators(self, response_data):
+        result = []
+        for record in response_data:
+            feed_label = record['feed_label'][0]
+            if not self.unique_feeds[feed_label].get('indicator_id'):
+                indicator = self.mapping._indicator(record)
+                result.append(indicator)
+                self.unique_feeds[feed_label]['indicator_id'] = indicator['id']
+        return result
+
+    def extract_relationships(self):
+        result = []
+        unique_feeds = self.unique_feeds.keys()
+        for feed in unique_feeds:
+            for sighting_id in self.unique_feeds[feed]['sighting_ids']:
+                indicator_id = self.unique_feeds[feed]['indicator_id']
+                relationship = self.mapping._relationship(
+                    sighting_id, indicator_id
+                )
+                result.append(relationship)
+        return result
+
+
+OBSERVABLE = {'type': 'domain', 'value': 'onedrive.live.com'}
+
+
+def records(size, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            'feed_label': [f'Feed {rng.randrange(FEEDS)}'],
+            'domain': ['onedrive.live.com'],
+            'address': ['https://onedrive.live.com/'],
+            'ip_address': ['13.107.42.13'],
+            'confidence': [rng.randint(0, 100)],
+            'reportime': [f'2020-{rng.randint(1, 12):02}-01'],
+            'source': ['http://www.phishtank.com/phish_detail.php?id=62'],
+            'assessment': ['phishing'],
+        }
+        for _ in range(size)
+    ]
+
+
+def measure(mapping_class, data, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = perf_counter()
+        mapping_class(OBSERVABLE).extract(data)
+        best = min(best, perf_counter() - start)
+
+    tracemalloc.start()
+    result = mapping_class(OBSERVABLE).extract(data)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    # The memory allocated on top of the resulting entities themselves.
+    return best, peak - retained
+
+
+def main():
+    print(f'{"records":>8} {"method":>12} {"us/record":>10} '
+          f'{"overhead, B/record":>19}')
+
+    with app.app_context():
+        for size in SIZES:
+            data = records(size)
+            for name, mapping_class in (('three-pass', LegacyExtraction),
+                                        ('single-pass', Domain)):
+                seconds, overhead = measure(mapping_class, data)
+                print(f'{size:>8} {name:>12} {seconds / size * 1e6:>10.2f} '
+                      f'{overhead / size:>19.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,343 @@
+"""
+End-to-end benchmark of the relay endpoints run offline through the Flask
+test client, with the C1fApp API replaced by recorded and synthetic responses.
+
+The recorded responses are rebuilt from the Threat Response investigation
+snapshots in `Snapshots_C1fApp/*.json` and from the fixtures in
+`tests/unit/conftest.py`, while the synthetic ones scale the latter up to
+thousands of records per observable.
+
+For each scenario the benchmark reports p50/p95/p99 latency, the mean time
+spent in each phase of request handling (summed across the threads for the
+concurrent upstream lookups) and the peak memory allocated while handling a
+single request.
+
+Usage:
+    python -m tests.benchmarks.bench_relay [--iterations N]
+        [--save results.json] [--compare baseline.json] [--tolerance 0.2]
+
+`--save` writes the results to a JSON file which can later be passed to
+`--compare` to report (and exit with a non-zero status on) the scenarios whose
+p50 latency has regressed by more than the tolerance.
+"""
+import argparse
+import glob
+import json
+import platform
+import sys
+import tracemalloc
+from collections import defaultdict
+from functools import wraps
+from http import HTTPStatus
+from os.path import basename, dirname, join
+from time import perf_counter
+from unittest.mock import patch
+
+from authlib.jose import jwt
+
+from api import client as c1fapp_client, enrich, health
+from api.mappings import Mapping
+from app import app
+from tests.unit.conftest import (
+    C1FAPP_RESPONSE_OK_PAYLOAD, c1fapp_api_response_mock
+)
+
+ROOT = dirname(dirname(dirname(__file__)))
+SNAPSHOTS = join(ROOT, 'Snapshots_C1fApp', '*.json')
+
+SECRET_KEY = 'benchmark'
+CONFIDENCE = {'Low': 10, 'Medium': 50, 'High': 90}
+
+# The phases of request handling and the functions they are measured by.
+PHASES = {
+    'jwt': ((enrich, 'get_jwt'), (health, 'get_jwt')),
+    'validation': ((enrich, 'get_observables'),),
+    'upstream': ((c1fapp_client.C1fAppClient, 'get_c1fapp_response'),),
+    'mapping': ((Mapping, 'extract'),),
+    'serialization': ((enrich, 'jsonify_result'),
+                      (health, 'jsonify_data')),
+}
+
+
+class Scenario:
+    def __init__(self, name, route, observables=None, responses=None):
+        self.name = name
+        self.route = route
+        self.observables = observables
+        self.responses = responses or {}
+        # Keep the responses serialized to account for decoding them.
+        self.bodies = {
+            observable: json.dumps(records)
+            for observable, records in self.responses.items()
+        }
+
+    def c1fapp_response(self, *args, **kwargs):
+        response = c1fapp_api_response_mock(HTTPStatus.OK)
+        body = self.bodies.get(kwargs['json']['request'], '[]')
+        response.json = lambda: json.loads(body)
+        return response
+
+
+def snapshot_records(observable, data):
+    """Rebuild the C1fApp records behind the CTIM entities of a snapshot."""
+
+    indicators = {doc['id']: doc for doc in data['indicators']['docs']}
+    feeds = {
+        doc['source_ref']: indicators[doc['target_ref']]
+        for doc in data['relationships']['docs']
+    }
+
+    records = []
+    for sighting in data['sightings']['docs']:
+        indicator = feeds[sighting['id']]
+        ips, domains, addresses = [], [], []
+        for relation in sighting['relations']:
+            for related in (relation['source'], relation['related']):
+                if related == observable:
+                    continue
+                {'ip': ips, 'domain': domains, 'url': addresses}[
+                    related['type']
+                ].append(related['value'])
+
+        records.append({
+            'feed_label': [indicator['short_description']],
+            'assessment': indicator['tags'],
+            'confidence': [CONFIDENCE[sighting['confidence']]],
+            'reportime': [sighting['observed_time']['start_time'][:10]],
+            'source': [sighting['source_uri']],
+            'domain': domains or [''],
+            'ip_address': ips or [''],
+            'address': addresses or [observable['value']],
+        })
+
+    return records
+
+
+def snapshot_scenarios():
+    for path in sorted(glob.glob(SNAPSHOTS)):
+        for action in json.loads(json.load(open(path))['actions']):
+            if action['type'] != 'investigate':
+                continue
+            for module in action['result']['data']:
+                if module['module'] != 'C1fApp':
+                    continue
+                observable = action['arg']
+                yield Scenario(
+                    f'snapshot:{basename(path)}', '/observe/observables',
+                    [observable],
+                    {observable['value']: snapshot_records(
+                        observable, module['data']
+                    )}
+                )
+
+
+def synthetic_records(count):
+    record = C1FAPP_RESPONSE_OK_PAYLOAD[0]
+    return [
+        {
+            **record,
+            'feed_label': [f'Feed {index % 10}'],
+            'confidence': [index % 101],
+            'reportime': [f'20{10 + index % 11}-{index % 12 + 1:02}-01'],
+        }
+        for index in range(count)
+    ]
+
+
+def synthetic_scenarios():
+    observable = {'type': 'domain', 'value': 'onedrive.live.com'}
+
+    yield Scenario('health', '/health', None,
+                   {'test.com': C1FAPP_RESPONSE_OK_PAYLOAD})
+    yield Scenario('fixture', '/observe/observables', [observable],
+                   {observable['value']: C1FAPP_RESPONSE_OK_PAYLOAD})
+
+    for count in (100, 1000, 10000):
+        yield Scenario(
+            f'synthetic:1x{count}', '/observe/observables', [observable],
+            {observable['value']: synthetic_records(count)}
+        )
+
+    observables = [{'type': 'domain', 'value': f'{index}.example.com'}
+                   for index in range(50)]
+    yield Scenario(
+        'synthetic:50x100', '/observe/observables', observables,
+        {o['value']: synthetic_records(100) for o in observables}
+    )
+
+
+def scenarios():
+    yield from synthetic_scenarios()
+    yield from snapshot_scenarios()
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = max(int(round(percent / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+class PhaseTimer:
+    def __init__(self):
+        self.current = defaultdict(float)
+        self.patches = []
+
+    def timed(self, phase, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.current[phase] += perf_counter() - start
+        return wrapper
+
+    def __enter__(self):
+        for phase, targets in PHASES.items():
+            for owner, name in targets:
+                func = getattr(owner, name)
+                self.patches.append(patch.object(
+                    owner, name, self.timed(phase, func)
+                ))
+        for patch_ in self.patches:
+            patch_.start()
+        return self
+
+    def __exit__(self, *args):
+        for patch_ in reversed(self.patches):
+            patch_.stop()
+
+    def reset(self):
+        phases, self.current = self.current, defaultdict(float)
+        return phases
+
+
+def run(scenario, client, token, iterations):
+    def request():
+        response = client.post(
+            scenario.route, headers={'Authorization': f'Bearer {token}'},
+            json=scenario.observables
+        )
+        assert response.status_code == HTTPStatus.OK, response.data
+        assert 'errors' not in response.get_json(), response.data
+
+    latencies = []
+    phases = defaultdict(float)
+
+    with patch('requests.Session.post', side_effect=scenario.c1fapp_response):
+        request()
+
+        with PhaseTimer() as timer:
+            for _ in range(iterations):
+                start = perf_counter()
+                request()
+                latencies.append(perf_counter() - start)
+                for phase, seconds in timer.reset().items():
+                    phases[phase] += seconds
+
+        tracemalloc.start()
+        request()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    milliseconds = 1000 / iterations
+    return {
+        'iterations': iterations,
+        'latency_ms': {
+            'mean': sum(latencies) * milliseconds,
+            'p50': percentile(latencies, 50) * 1000,
+            'p95': percentile(latencies, 95) * 1000,
+            'p99': percentile(latencies, 99) * 1000,
+        },
+        'phases_ms': {
+            phase: phases[phase] * milliseconds for phase in PHASES
+            if phase in phases
+        },
+        'peak_memory_kib': peak / 1024,
+    }
+
+
+def benchmark(iterations):
+    # Measure the actual work rather than cache hits.
+    app.config.update(
+        SECRET_KEY=SECRET_KEY,
+        C1FAPP_CACHE_TTL=0,
+        C1FAPP_NEGATIVE_CACHE_TTL=0,
+        JWT_CACHE_TTL=0,
+    )
+    c1fapp_client._cache = None
+    c1fapp_client._negative_cache = None
+    token = jwt.encode(
+        {'alg': 'HS256'}, {'key': 'benchmark'}, SECRET_KEY
+    ).decode('ascii')
+
+    results = {}
+    with app.test_client() as client:
+        for scenario in scenarios():
+            # Large responses are too slow to be replayed as many times.
+            records = max(map(len, scenario.responses.values()), default=1)
+            count = max(min(iterations, iterations * 100 // records), 5)
+            results[scenario.name] = run(scenario, client, token, count)
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scenarios': results,
+    }
+
+
+def report(results, baseline=None, tolerance=0.2):
+    phases = list(PHASES)
+    print(f'{"scenario":<44} {"p50":>8} {"p95":>8} {"p99":>8} '
+          + ' '.join(f'{phase[:8]:>8}' for phase in phases)
+          + f' {"peak KiB":>9}' + (f' {"vs base":>8}' if baseline else ''))
+
+    regressions = []
+    for name, result in results['scenarios'].items():
+        latency = result['latency_ms']
+        line = (f'{name:<44} {latency["p50"]:>8.2f} {latency["p95"]:>8.2f} '
+                f'{latency["p99"]:>8.2f} '
+                + ' '.join(f'{result["phases_ms"].get(phase, 0):>8.2f}'
+                           for phase in phases)
+                + f' {result["peak_memory_kib"]:>9.0f}')
+
+        base = (baseline or {}).get('scenarios', {}).get(name)
+        if base:
+            ratio = latency['p50'] / base['latency_ms']['p50']
+            line += f' {ratio:>7.2f}x'
+            if ratio > 1 + tolerance:
+                regressions.append(name)
+        print(line)
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--save', help='write the results to a JSON file')
+    parser.add_argument('--compare', help='compare with saved results')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+
+    results = benchmark(args.iterations)
+    regressions = report(results, baseline, args.tolerance)
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+
+    if regressions:
+        print(f'Regressions: {", ".join(regressions)}', file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+Compare selecting the latest C1fApp records with a full sort against the
+heap-based top-K selection used by the relay.
+
+Usage: python -m tests.benchmarks.bench_top_k
+"""
+import random
+import tracemalloc
+from timeit import Timer
+
+from api.utils import latest_records
+
+SIZES = (1000, 10000, 100000)
+LIMIT = 100
+
+
+def full_sort(records, limit):
+    return sorted(
+        records, key=lambda x: x['reportime'], reverse=True
+    )[:limit]
+
+
+def records(size, seed=0):
+    rng = random.Random(seed)
+    return [
+        {'reportime': [f'20{rng.randint(10, 20)}-'
+                       f'{rng.randint(1, 12):02}-{rng.randint(1, 28):02}']}
+        for _ in range(size)
+    ]
+
+
+def measure(func, data):
+    timer = Timer(lambda: func(data, LIMIT))
+    number, _ = timer.autorange()
+    seconds = min(timer.repeat(repeat=3, number=number)) / number
+
+    tracemalloc.start()
+    func(data, LIMIT)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return seconds, peak
+
+
+def main():
+    print(f'{"records":>8} {"method":>10} {"time, ms":>10} {"peak, KiB":>10}')
+
+    for size in SIZES:
+        data = records(size)
+        assert latest_records(data, LIMIT) == full_sort(data, LIMIT)
+
+        for name, func in (('sort', full_sort), ('top-k', latest_records)):
+            seconds, peak = measure(func, data)
+            print(f'{size:>8} {name:>10} {seconds * 1000:>10.3f} '
+                  f'{peak / 1024:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Compare validating observable payloads with the marshmallow
+`ObservableSchema` against the precompiled `ObservableValidator`.
+
+Usage: python -m tests.benchmarks.bench_validation
+"""
+from timeit import Timer
+
+from api.schemas import (
+    OBSERVABLE_TYPE_CHOICES, ObservableSchema, ObservableValidator
+)
+
+SIZES = (10, 1000, 10000)
+
+
+def payload(size):
+    return [
+        {'type': OBSERVABLE_TYPE_CHOICES[index % len(OBSERVABLE_TYPE_CHOICES)],
+         'value': f'{index}.example.com'}
+        for index in range(size)
+    ]
+
+
+def main():
+    validators = (
+        ('marshmallow', ObservableSchema(many=True)),
+        ('compiled', ObservableValidator()),
+    )
+
+    print(f'{"observables":>11} {"validator":>12} {"ms":>10}')
+
+    for size in SIZES:
+        data = payload(size)
+        for name, validator in validators:
+            assert validator.validate(data) == {}
+            timer = Timer(lambda: validator.validate(data))
+            number, _ = timer.autorange()
+            seconds = min(timer.repeat(repeat=3, number=number)) / number
+            print(f'{size:>11} {name:>12} {seconds * 1000:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
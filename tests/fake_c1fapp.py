@@ -0,0 +1,257 @@
+"""
+Local stand-in for the C1fApp API (`https://www.c1fapp.com/cifapp/api/`) to
+load test the relay without using up the quota of a real API key.
+
+The server accepts the same JSON requests as `api.client.C1fAppClient` and
+responds with synthetic records, the texts C1fApp uses for unsupported and
+empty searches, or (at configurable rates) 429/5xx errors, after a delay drawn
+from a configurable latency distribution.
+
+Usage:
+    python -m tests.fake_c1fapp [--port 8081] [--latency lognormal:80:0.5]
+        [--records 0:200] [--throttle-rate 0.01] [--error-rate 0.01]
+
+Then point the relay at it, e.g.:
+    API_URL=http://127.0.0.1:8081/cifapp/api/ flask run
+
+Latency distributions (in milliseconds):
+    constant:MS, uniform:MIN:MAX, normal:MEAN:STDDEV,
+    lognormal:MEDIAN:SIGMA, exponential:MEAN
+
+Response sizes (in records per observable):
+    N or MIN:MAX (a search drawing 0 records is reported as empty)
+"""
+import argparse
+import ipaddress
+import json
+import random
+from contextlib import contextmanager
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from math import exp
+from threading import Lock, Thread
+from time import sleep
+
+UNSUPPORTED_REQUEST = 'Unsupported request ? IPv4/Domain only'
+EMPTY_SEARCH = 'Empty Search! Available search: IPv4/URL/Domain'
+
+SERVER_ERRORS = (
+    HTTPStatus.INTERNAL_SERVER_ERROR,
+    HTTPStatus.BAD_GATEWAY,
+    HTTPStatus.SERVICE_UNAVAILABLE,
+)
+
+FEEDS = (
+    ('Phishtank', 'phishing'),
+    ('OpenPhish', 'phishing'),
+    ('Malware Domain List', 'malware'),
+    ('Zeus Tracker', 'botnet'),
+    ('Feodo Tracker', 'botnet'),
+    ('Ransomware Tracker', 'malware'),
+    ('Blocklist.de', 'scanner'),
+    ('Spamhaus DROP', 'spam'),
+)
+
+
+def parse_latency(spec):
+    """Turn a latency distribution spec into a function drawing seconds."""
+
+    name, *params = spec.split(':')
+
+    try:
+        params = [float(param) for param in params]
+        draw = {
+            'constant': lambda rng, ms: ms,
+            'uniform': lambda rng, low, high: rng.uniform(low, high),
+            'normal': lambda rng, mean, stddev: rng.gauss(mean, stddev),
+            'lognormal': (
+                lambda rng, median, sigma: median * exp(rng.gauss(0, sigma))
+            ),
+            'exponential': (
+                lambda rng, mean: rng.expovariate(1 / mean) if mean else 0
+            ),
+        }[name]
+        draw(random.Random(), *params)
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f'Invalid latency distribution: {spec}.')
+
+    return lambda rng: max(draw(rng, *params), 0) / 1000
+
+
+def parse_records(spec):
+    """Turn a response size spec into a function drawing a record count."""
+
+    try:
+        low, _, high = spec.partition(':')
+        low, high = int(low), int(high or low)
+        assert 0 <= low <= high
+    except (ValueError, AssertionError):
+        raise ValueError(f'Invalid number of records: {spec}.')
+
+    return lambda rng: rng.randint(low, high)
+
+
+def is_supported(observable):
+    """Mimic the observables accepted by C1fApp: IPv4, domains and URLs."""
+
+    try:
+        return ipaddress.ip_address(observable).version == 4
+    except ValueError:
+        pass
+
+    return ('.' in observable or '/' in observable) and not any(
+        character.isspace() for character in observable
+    )
+
+
+def make_record(observable, index, rng):
+    feed_label, assessment = rng.choice(FEEDS)
+    domain = observable.split('://')[-1].split('/')[0]
+    ip_address = '.'.join(str(rng.randint(1, 254)) for _ in range(4))
+
+    return {
+        'feed_label': [feed_label],
+        'domain': [domain],
+        'description': [f'{feed_label} record {index}'],
+        'derived': 'direct',
+        'address': [f'http://{domain}/{index}'],
+        'ip_address': [ip_address],
+        'asn': ['-'],
+        'confidence': [rng.randint(0, 100)],
+        'country': [rng.choice(('US', 'DE', 'NL', 'RU', 'CN'))],
+        'reportime': [
+            f'20{rng.randint(10, 20)}-{rng.randint(1, 12):02}-'
+            f'{rng.randint(1, 28):02}'
+        ],
+        'source': [f'http://feeds.example.com/{feed_label}/{index}'],
+        'asn_desc': ['-'],
+        'assessment': [assessment],
+    }
+
+
+class FakeC1fApp:
+    """
+    Settings and state of the stand-in server. The records returned for an
+    observable only depend on the seed and the observable itself, while the
+    latencies and errors are drawn from a shared random generator.
+    """
+
+    def __init__(self, latency='constant:0', records='1', throttle_rate=0,
+                 error_rate=0, seed=0):
+        self.latency = parse_latency(latency)
+        self.records = parse_records(records)
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.seed = seed
+        self.requests = []
+        self._random = random.Random(seed)
+        self._lock = Lock()
+
+    def respond(self, data):
+        """Return the status code and the body of a response to the data."""
+
+        with self._lock:
+            self.requests.append(data)
+            delay = self.latency(self._random)
+            draw = self._random.random()
+            server_error = self._random.choice(SERVER_ERRORS)
+
+        sleep(delay)
+
+        if draw < self.throttle_rate:
+            return HTTPStatus.TOO_MANY_REQUESTS, 'Too Many Requests'
+
+        if draw < self.throttle_rate + self.error_rate:
+            return server_error, server_error.phrase
+
+        observable = str(data.get('request', '')).strip()
+
+        if not observable:
+            return HTTPStatus.OK, EMPTY_SEARCH
+
+        if not is_supported(observable):
+            return HTTPStatus.OK, UNSUPPORTED_REQUEST
+
+        rng = random.Random(f'{self.seed}:{observable}')
+        count = self.records(rng)
+
+        if not count:
+            return HTTPStatus.OK, EMPTY_SEARCH
+
+        return HTTPStatus.OK, json.dumps(
+            [make_record(observable, index, rng) for index in range(count)]
+        )
+
+    @contextmanager
+    def serve(self, host='127.0.0.1', port=0):
+        """Run the server in a background thread and yield its API URL."""
+
+        server = ThreadingHTTPServer((host, port), self.handler())
+        server.daemon_threads = True
+        thread = Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+        thread.start()
+
+        try:
+            yield f'http://{host}:{server.server_port}/cifapp/api/'
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+
+                try:
+                    data = json.loads(body)
+                    assert isinstance(data, dict)
+                except (ValueError, AssertionError):
+                    status, text = HTTPStatus.BAD_REQUEST, 'Bad Request'
+                else:
+                    status, text = fake.respond(data)
+
+                body = text.encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', default='lognormal:80:0.5')
+    parser.add_argument('--records', default='0:200')
+    parser.add_argument('--throttle-rate', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    try:
+        fake = FakeC1fApp(args.latency, args.records, args.throttle_rate,
+                          args.error_rate, args.seed)
+    except ValueError as error:
+        parser.error(str(error))
+
+    with fake.serve(args.host, args.port) as url:
+        print(f'Serving a fake C1fApp API at {url} (press Ctrl+C to stop)')
+        try:
+            while True:
+                sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+from fnmatch import fnmatchcase
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+from threading import Thread
+from time import monotonic
+
+
+class RedisServer(ThreadingTCPServer):
+    """
+    Minimal in-memory stand-in for a Redis server which speaks just enough
+    of the protocol to exercise `api.cache.RedisCache`.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, clock=monotonic):
+        super().__init__(('127.0.0.1', 0), RedisHandler)
+        self.clock = clock
+        self.entries = {}
+        self.thread = Thread(
+            target=self.serve_forever, args=(0.01,), daemon=True
+        )
+
+    @property
+    def url(self):
+        return f'redis://127.0.0.1:{self.server_address[1]}/0'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+    def lookup(self, key):
+        value, expires_at = self.entries.get(key, (None, None))
+        if expires_at is not None and expires_at <= self.clock():
+            del self.entries[key]
+            return None
+        return value
+
+
+class RedisHandler(StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2].decode())
+
+            command = getattr(self, f'command_{args[0].lower()}')
+            self.wfile.write(command(*args[1:]))
+
+    @staticmethod
+    def bulk(value):
+        if value is None:
+            return b'$-1\r\n'
+        value = value.encode()
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def command_ping(self):
+        return b'+PONG\r\n'
+
+    def command_get(self, key):
+        return self.bulk(self.server.lookup(key))
+
+    def command_set(self, key, value, *options):
+        expires_at = None
+        if options and options[0].upper() == 'PX':
+            expires_at = self.server.clock() + int(options[1]) / 1000
+        self.server.entries[key] = value, expires_at
+        return b'+OK\r\n'
+
+    def command_del(self, *keys):
+        deleted = sum(
+            self.server.entries.pop(key, None) is not None for key in keys
+        )
+        return b':%d\r\n' % deleted
+
+    def command_scan(self, cursor, *options):
+        pattern = dict(zip(options[::2], options[1::2])).get('MATCH', '*')
+        keys = [key for key in list(self.server.entries)
+                if fnmatchcase(key, pattern)]
+        return b'*2\r\n' + self.bulk('0') + b'*%d\r\n%s' % (
+            len(keys), b''.join(map(self.bulk, keys))
+        )
@@ -0,0 +1,289 @@
+from http import HTTPStatus
+from unittest.mock import patch
+
+from pytest import fixture
+
+from api import cache, client as c1fapp_client
+from api.cache import (
+    MemoryCache, RedisCache, SQLiteCache, cache_key, create_cache
+)
+from api.client import C1fAppClient
+from api.stream import RECORD_FIELDS
+from ..conftest import C1FAPP_RESPONSE_OK_PAYLOAD, c1fapp_api_response_mock
+from .redis_server import RedisServer
+from .utils import headers
+
+
+@fixture
+def clock(monkeypatch):
+    now = [0]
+    monkeypatch.setattr(cache, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(cache, 'time', lambda: now[0])
+    return now
+
+
+@fixture
+def redis_server(clock):
+    with RedisServer(clock=lambda: clock[0]) as server:
+        yield server
+
+
+def backends():
+    yield 'memory'
+    yield 'sqlite'
+    yield 'redis'
+
+
+@fixture(params=backends())
+def backend(request):
+    return request.param
+
+
+@fixture
+def make_cache(backend, tmp_path, request, client):
+    def make_cache(ttl, max_entries):
+        if backend == 'sqlite':
+            return SQLiteCache(
+                str(tmp_path / 'cache.sqlite3'), ttl, max_entries
+            )
+        if backend == 'redis':
+            redis_server = request.getfixturevalue('redis_server')
+            return RedisCache(redis_server.url, ttl, max_entries)
+        return MemoryCache(ttl, max_entries)
+
+    with client.application.app_context():
+        yield make_cache
+
+
+def test_cache_key_hides_api_key():
+    key = cache_key('secret', 'cisco.com')
+
+    assert 'secret' not in key
+    assert key.endswith(':cisco.com')
+    assert key != cache_key('another secret', 'cisco.com')
+
+
+def test_cache_stores_values(make_cache, clock):
+    ttl_cache = make_cache(ttl=10, max_entries=10)
+    ttl_cache.set('key', [{'domain': ['cisco.com']}])
+
+    assert ttl_cache.get('key') == [{'domain': ['cisco.com']}]
+    assert ttl_cache.get('another key') is None
+
+    assert ttl_cache.stats()['hits'] == 1
+    assert ttl_cache.stats()['misses'] == 1
+
+
+def test_cache_entries_expire(make_cache, clock):
+    ttl_cache = make_cache(ttl=10, max_entries=10)
+    ttl_cache.set('key', [])
+    ttl_cache.set('short-lived key', [], ttl=5)
+
+    clock[0] = 5
+    assert ttl_cache.get('short-lived key') is None
+
+    clock[0] = 9
+    assert ttl_cache.get('key') == []
+
+    clock[0] = 10
+    assert ttl_cache.get('key') is None
+
+
+def test_cache_can_be_cleared(make_cache, clock):
+    ttl_cache = make_cache(ttl=10, max_entries=10)
+    ttl_cache.set('key', [])
+    ttl_cache.clear()
+
+    assert ttl_cache.get('key') is None
+
+
+def test_cache_can_be_disabled(make_cache, clock):
+    ttl_cache = make_cache(ttl=0, max_entries=10)
+    ttl_cache.set('key', [])
+
+    assert ttl_cache.get('key') is None
+
+
+def test_cache_evicts_least_recently_used_entry(make_cache, backend, clock):
+    if backend == 'redis':
+        # Redis relies on its own eviction policy.
+        return
+
+    ttl_cache = make_cache(ttl=10, max_entries=2)
+    ttl_cache.set('first', [1])
+    clock[0] += 1
+    ttl_cache.set('second', [2])
+    clock[0] += 1
+
+    assert ttl_cache.get('first') == [1]
+    clock[0] += 1
+
+    ttl_cache.set('third', [3])
+
+    assert ttl_cache.get('second') is None
+    assert ttl_cache.get('first') == [1]
+    assert ttl_cache.get('third') == [3]
+    assert ttl_cache.stats()['evictions'] == 1
+    assert ttl_cache.stats()['size'] == 2
+
+
+def test_sqlite_cache_is_shared_between_instances(tmp_path, clock):
+    path = str(tmp_path / 'cache.sqlite3')
+    SQLiteCache(path, 10, 10).set('key', [1])
+
+    assert SQLiteCache(path, 10, 10).get('key') == [1]
+
+
+def test_redis_cache_failure_is_a_miss(client):
+    with RedisServer() as server:
+        url = server.url
+
+    with client.application.app_context():
+        redis_cache = RedisCache(url, 10, 10)
+        redis_cache.set('key', [1])
+        assert redis_cache.get('key') is None
+
+
+def test_redis_cache_backs_off_after_failed_connect(client, clock):
+    with RedisServer() as server:
+        url = server.url
+
+    redis_cache = RedisCache(url, 10, 10, backoff=5)
+    with patch('socket.create_connection',
+               side_effect=ConnectionRefusedError) as mock_connect:
+        redis_cache.set('key', [1])
+        assert redis_cache.get('key') is None
+        assert mock_connect.call_count == 1
+
+        clock[0] = 5
+        assert redis_cache.get('key') is None
+        assert mock_connect.call_count == 2
+
+
+@patch('requests.Session.post')
+def test_lookups_with_unreachable_redis_cache(
+        mock_request, client, valid_jwt, c1fapp_response_ok, monkeypatch
+):
+    with RedisServer() as server:
+        url = server.url
+
+    monkeypatch.setitem(
+        client.application.config, 'C1FAPP_CACHE_BACKEND', 'redis'
+    )
+    monkeypatch.setitem(
+        client.application.config, 'C1FAPP_CACHE_REDIS_URL', url
+    )
+    mock_request.return_value = c1fapp_response_ok
+
+    response = client.post(
+        '/observe/observables', headers=headers(valid_jwt),
+        json=[{'type': 'domain', 'value': 'onedrive.live.com'},
+              {'type': 'domain', 'value': 'cisco.com'},
+              {'type': 'ip', 'value': '1.1.1.1'}]
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert 'errors' not in response.get_json()
+    assert mock_request.call_count == 3
+
+
+def test_cache_backend_is_configurable(tmp_path):
+    config = {
+        'C1FAPP_CACHE_BACKEND': 'sqlite',
+        'C1FAPP_CACHE_SQLITE_PATH': str(tmp_path / 'cache.sqlite3'),
+        'C1FAPP_CACHE_REDIS_URL': 'redis://localhost:6379/0',
+    }
+    assert isinstance(create_cache(config, 10, 10), SQLiteCache)
+
+    config['C1FAPP_CACHE_BACKEND'] = 'redis'
+    assert isinstance(create_cache(config, 10, 10), RedisCache)
+
+    config['C1FAPP_CACHE_BACKEND'] = 'memory'
+    assert isinstance(create_cache(config, 10, 10), MemoryCache)
+
+
+@patch('requests.Session.post')
+def test_repeated_lookup_is_served_from_cache(
+        mock_request, client, valid_jwt, c1fapp_response_ok
+):
+    mock_request.return_value = c1fapp_response_ok
+
+    for _ in range(2):
+        response = client.post(
+            '/observe/observables', headers=headers(valid_jwt),
+            json=[{'type': 'domain', 'value': 'onedrive.live.com'}]
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert response.get_json()['data']['sightings']['count'] == 1
+
+    mock_request.assert_called_once()
+
+
+@patch('requests.Session.post')
+def test_only_latest_records_are_cached(
+        mock_request, client, monkeypatch
+):
+    monkeypatch.setitem(client.application.config, 'CTR_ENTITIES_LIMIT', 2)
+    payload = [
+        {**C1FAPP_RESPONSE_OK_PAYLOAD[0], 'reportime': [f'2020-0{month}-01']}
+        for month in range(1, 6)
+    ]
+    mock_request.return_value = \
+        c1fapp_api_response_mock(HTTPStatus.OK, payload)
+
+    with client.application.app_context():
+        C1fAppClient('key').get_c1fapp_response('onedrive.live.com')
+
+        cached = c1fapp_client._cache.get(
+            cache_key('key', 'onedrive.live.com')
+        )
+
+    assert [record['reportime'] for record in cached] == \
+        [['2020-05-01'], ['2020-04-01']]
+    assert all(set(record) <= set(RECORD_FIELDS) for record in cached)
+
+
+@patch('requests.Session.post')
+def test_empty_lookups_are_served_from_negative_cache(
+        mock_request, client, valid_jwt, c1fapp_response_ok, clock
+):
+    mock_request.side_effect = [
+        c1fapp_api_response_mock(HTTPStatus.OK), c1fapp_response_ok
+    ]
+    observables = [{'type': 'domain', 'value': 'cisco.com'},
+                   {'type': 'domain', 'value': 'onedrive.live.com'}]
+
+    for _ in range(2):
+        for observable in observables:
+            response = client.post(
+                '/observe/observables', headers=headers(valid_jwt),
+                json=[observable]
+            )
+            assert response.status_code == HTTPStatus.OK
+
+    assert mock_request.call_count == 2
+    assert c1fapp_client._negative_cache.stats()['size'] == 1
+    assert c1fapp_client._negative_cache.stats()['hits'] == 1
+    assert c1fapp_client._cache.stats()['size'] == 1
+
+    metrics = client.get('/metrics').get_data(as_text=True)
+    assert 'relay_cache_hits_total{cache="c1fapp_negative"} 1' in metrics
+
+
+@patch('requests.Session.post')
+def test_negative_cache_has_its_own_ttl(
+        mock_request, client, valid_jwt, clock, monkeypatch
+):
+    monkeypatch.setitem(
+        client.application.config, 'C1FAPP_NEGATIVE_CACHE_TTL', 5
+    )
+    mock_request.return_value = c1fapp_api_response_mock(HTTPStatus.OK)
+
+    for now in (0, 4, 5):
+        clock[0] = now
+        client.post(
+            '/observe/observables', headers=headers(valid_jwt),
+            json=[{'type': 'domain', 'value': 'cisco.com'}]
+        )
+
+    assert mock_request.call_count == 2
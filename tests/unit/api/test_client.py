@@ -0,0 +1,336 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Barrier, Event, Thread
+from time import monotonic, sleep
+from unittest.mock import patch
+
+from pytest import fixture, raises
+from requests.exceptions import ConnectionError, ReadTimeout
+
+from api import client as c1fapp_client
+from api.client import C1fAppClient, connection_stats, is_shared
+from api.errors import (
+    TOO_MANY_REQUESTS, UNAVAILABLE, UNKNOWN, C1fAppCircuitOpenError,
+    C1fAppDeadlineError, C1fAppRateLimitError, C1fAppTimeoutError,
+    C1fAppUnavailableError, UnexpectedC1fAppError
+)
+from tests.fake_c1fapp import FakeC1fApp
+from ..conftest import c1fapp_api_error_mock, c1fapp_api_response_mock
+
+
+class C1fAppHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    requests = []
+
+    def do_POST(self):
+        self.requests.append(
+            self.rfile.read(int(self.headers['Content-Length']))
+        )
+        sleep(0.05)
+        body = b'[]'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@fixture(scope='module')
+def c1fapp_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), C1fAppHandler)
+    thread = Thread(
+        target=server.serve_forever, args=(0.01,), daemon=True
+    )
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}/cifapp/api/'
+    server.shutdown()
+    server.server_close()
+
+
+@fixture
+def app_context(client, c1fapp_server, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'API_URL', c1fapp_server)
+    monkeypatch.setattr(c1fapp_client, '_session', None)
+
+    with client.application.app_context():
+        yield
+
+
+def test_session_is_shared_between_clients(app_context):
+    assert C1fAppClient('key').session is C1fAppClient('key').session
+
+
+def test_pool_fits_the_lookups_in_flight(app_context, client, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'C1FAPP_POOL_SIZE', 10)
+    monkeypatch.setitem(
+        client.application.config, 'C1FAPP_MAX_CONCURRENCY', 30
+    )
+
+    adapter = C1fAppClient('key').session.get_adapter('https://')
+
+    assert adapter.poolmanager.connection_pool_kw['maxsize'] == 30
+
+
+def test_connections_are_reused(app_context):
+    for observable in ('cisco.com', 'cisco.org', 'cisco.net'):
+        assert C1fAppClient('key').get_c1fapp_response(observable) == []
+
+    assert connection_stats() == {
+        'requests': 3, 'connections': 1, 'reused': 2
+    }
+
+
+def test_concurrent_lookups_are_coalesced(app_context):
+    C1fAppHandler.requests.clear()
+    c1fapp = C1fAppClient('key')
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        results = list(executor.map(
+            c1fapp.get_c1fapp_response, ['cisco.com'] * 5
+        ))
+
+    assert results == [[]] * 5
+    assert len(C1fAppHandler.requests) == 1
+
+
+@patch('requests.Session.post')
+def test_coalesced_lookups_wait_within_their_own_deadline(
+        mock_request, client
+):
+    release = Event()
+
+    def c1fapp_response(*args, **kwargs):
+        release.wait(1)
+        return c1fapp_api_response_mock(HTTPStatus.OK, payload=[])
+
+    mock_request.side_effect = c1fapp_response
+
+    with client.application.app_context():
+        leader, follower = C1fAppClient('key'), C1fAppClient('key')
+        follower.deadline.expires_at = monotonic() + 0.05
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            result = executor.submit(leader.get_c1fapp_response, 'cisco.com')
+            sleep(0.02)
+
+            with raises(C1fAppDeadlineError):
+                follower.get_c1fapp_response('cisco.com')
+
+            release.set()
+            assert result.result() == []
+
+    mock_request.assert_called_once()
+
+
+def test_budget_errors_are_not_shared():
+    assert not is_shared(C1fAppDeadlineError('cisco.com'))
+    assert not is_shared(C1fAppRateLimitError('cisco.com'))
+    assert is_shared(C1fAppTimeoutError('cisco.com'))
+    assert is_shared(C1fAppUnavailableError())
+
+
+@fixture
+def fake_c1fapp(client, monkeypatch):
+    monkeypatch.setattr(c1fapp_client, '_session', None)
+
+    @contextmanager
+    def serve(**settings):
+        fake = FakeC1fApp(**settings)
+        with fake.serve() as url:
+            monkeypatch.setitem(client.application.config, 'API_URL', url)
+            monkeypatch.setitem(
+                client.application.config, 'C1FAPP_RETRY_BACKOFF', 0
+            )
+            with client.application.app_context():
+                yield fake
+
+    return serve
+
+
+def test_fake_c1fapp_records(fake_c1fapp):
+    with fake_c1fapp(records='5:10') as fake:
+        records = C1fAppClient('key').get_c1fapp_response('cisco.com')
+
+        assert 5 <= len(records) <= 10
+        assert fake.requests == [
+            {'format': 'json', 'backend': 'es', 'key': 'key',
+             'request': 'cisco.com'}
+        ]
+
+
+def test_fake_c1fapp_not_critical_errors(fake_c1fapp):
+    with fake_c1fapp(records='0'):
+        c1fapp = C1fAppClient('key')
+
+        assert c1fapp.get_c1fapp_response('cisco.com') == []
+        assert c1fapp.get_c1fapp_response('2001:db8::1') == []
+
+
+def test_fake_c1fapp_errors(fake_c1fapp):
+    with fake_c1fapp(throttle_rate=1) as fake:
+        with raises(UnexpectedC1fAppError) as error:
+            C1fAppClient('key').get_c1fapp_response('cisco.com')
+
+        assert error.value.code == TOO_MANY_REQUESTS
+        assert len(fake.requests) == 3
+
+    with fake_c1fapp(error_rate=1):
+        with raises(UnexpectedC1fAppError) as error:
+            C1fAppClient('key').get_c1fapp_response('cisco.com')
+
+        assert error.value.code == UNKNOWN
+
+
+@fixture
+def retrying(client, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'C1FAPP_RETRY_BACKOFF', 0)
+    with client.application.app_context():
+        yield
+
+
+def c1fapp_retry_mock(status_code, retry_after='0'):
+    response = c1fapp_api_error_mock(status_code)
+    response.headers = {'Retry-After': retry_after}
+    return response
+
+
+@patch('requests.Session.post')
+def test_throttled_lookups_are_retried(mock_request, retrying):
+    mock_request.side_effect = [
+        c1fapp_retry_mock(HTTPStatus.TOO_MANY_REQUESTS),
+        c1fapp_retry_mock(HTTPStatus.SERVICE_UNAVAILABLE),
+        c1fapp_api_response_mock(HTTPStatus.OK, payload=[]),
+    ]
+
+    assert C1fAppClient('key').get_c1fapp_response('cisco.com') == []
+    assert mock_request.call_count == 3
+
+
+@patch('requests.Session.post')
+def test_retries_do_not_pass_the_deadline(mock_request, retrying):
+    mock_request.return_value = c1fapp_retry_mock(
+        HTTPStatus.TOO_MANY_REQUESTS, retry_after='60'
+    )
+
+    with raises(UnexpectedC1fAppError):
+        C1fAppClient('key').get_c1fapp_response('cisco.com')
+
+    assert mock_request.call_count == 1
+
+
+@patch('requests.Session.post')
+def test_timeouts_are_bounded_by_the_deadline(
+        mock_request, client, monkeypatch
+):
+    monkeypatch.setitem(client.application.config, 'C1FAPP_DEADLINE', 2)
+    mock_request.return_value = c1fapp_api_response_mock(HTTPStatus.OK)
+
+    with client.application.app_context():
+        C1fAppClient('key').get_c1fapp_response('cisco.com')
+
+    connect_timeout, read_timeout = mock_request.call_args[1]['timeout']
+    assert 0 < connect_timeout == read_timeout <= 2
+
+
+@patch('requests.Session.post')
+def test_lookups_past_the_deadline_are_skipped(mock_request, client):
+    mock_request.side_effect = ReadTimeout()
+
+    with client.application.app_context():
+        c1fapp = C1fAppClient('key')
+
+        with raises(C1fAppTimeoutError):
+            c1fapp.get_c1fapp_response('cisco.com')
+
+        c1fapp.deadline.expires_at = 0
+        with raises(C1fAppDeadlineError):
+            c1fapp.get_c1fapp_response('cisco.org')
+
+    assert mock_request.call_count == 1
+
+
+@patch('requests.Session.post')
+def test_overloaded_c1fapp_lowers_the_concurrency_limit(
+        mock_request, retrying
+):
+    mock_request.side_effect = [
+        c1fapp_retry_mock(HTTPStatus.SERVICE_UNAVAILABLE),
+        c1fapp_api_response_mock(HTTPStatus.OK, payload=[]),
+    ]
+
+    c1fapp = C1fAppClient('key')
+    assert c1fapp.get_c1fapp_response('cisco.com') == []
+
+    assert c1fapp.concurrency_limiter.stats() == {
+        'limit': 5, 'in_flight': 0, 'waiting': 0
+    }
+    assert c1fapp_client.get_concurrency_limiter() is \
+        c1fapp.concurrency_limiter
+
+
+@patch('requests.Session.post')
+def test_concurrency_limit_grows_past_max_workers(
+        mock_request, client, monkeypatch
+):
+    config = client.application.config
+    monkeypatch.setitem(config, 'C1FAPP_MAX_WORKERS', 2)
+    monkeypatch.setitem(config, 'C1FAPP_MAX_CONCURRENCY', 4)
+    in_flight = Barrier(4, timeout=5)
+
+    def c1fapp_response(*args, **kwargs):
+        if kwargs['json']['request'].startswith('concurrent'):
+            in_flight.wait()
+        else:
+            sleep(0.01)
+        return c1fapp_api_response_mock(HTTPStatus.OK, payload=[])
+
+    mock_request.side_effect = c1fapp_response
+
+    with client.application.app_context():
+        c1fapp = C1fAppClient('key')
+        assert c1fapp.concurrency_limiter.stats()['limit'] == 2
+
+        for index in range(6):
+            c1fapp.get_c1fapp_response(f'cisco-{index}.com')
+        assert c1fapp.concurrency_limiter.stats()['limit'] == 4
+
+        # All the four lookups have to be in flight at once to pass.
+        observables = [f'concurrent-{index}.com' for index in range(4)]
+        assert [error for _, error in c1fapp.get_c1fapp_responses(
+            observables
+        )] == [None] * 4
+
+
+@patch('requests.Session.post')
+def test_circuit_breaker_fails_fast_during_outages(
+        mock_request, client, monkeypatch
+):
+    config = client.application.config
+    monkeypatch.setitem(config, 'C1FAPP_CIRCUIT_MIN_LOOKUPS', 3)
+    monkeypatch.setitem(config, 'C1FAPP_RETRIES', 0)
+    mock_request.return_value = c1fapp_api_response_mock(HTTPStatus.OK)
+
+    with client.application.app_context():
+        c1fapp = C1fAppClient('key')
+        assert c1fapp.get_c1fapp_response('cisco.com') == []
+
+        mock_request.return_value = None
+        mock_request.side_effect = ConnectionError()
+        for observable in ('cisco.org', 'cisco.net'):
+            with raises(C1fAppUnavailableError) as error:
+                c1fapp.get_c1fapp_response(observable)
+            assert error.value.code == UNAVAILABLE
+
+        with raises(C1fAppCircuitOpenError) as error:
+            c1fapp.get_c1fapp_response('cisco.io')
+        assert error.value.code == UNAVAILABLE
+
+        # Cached responses are still served.
+        assert c1fapp.get_c1fapp_response('cisco.com') == []
+
+    assert mock_request.call_count == 3
@@ -0,0 +1,266 @@
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from threading import Event, Thread
+from time import sleep
+
+from pytest import fixture, raises
+
+from api import concurrency
+from api.concurrency import AdaptiveLimiter, CircuitBreaker, SingleFlight
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    single_flight = SingleFlight()
+    release = Event()
+    calls = []
+
+    def lookup(value):
+        calls.append(value)
+        release.wait(1)
+        return [value]
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = [
+            executor.submit(single_flight.do, 'key', lookup, 'cisco.com')
+            for _ in range(5)
+        ]
+        # Let the other calls join the first one before it finishes.
+        sleep(0.05)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert calls == ['cisco.com']
+    assert results == [['cisco.com']] * 5
+
+
+def test_single_flight_shares_exceptions():
+    single_flight = SingleFlight()
+    release = Event()
+
+    def lookup():
+        release.wait(1)
+        raise ValueError('C1fApp is down')
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(single_flight.do, 'key', lookup)
+                   for _ in range(3)]
+        # Let the other calls join the first one before it finishes.
+        sleep(0.05)
+        release.set()
+        for future in futures:
+            with raises(ValueError):
+                future.result()
+
+
+def test_single_flight_retries_unshared_exceptions():
+    single_flight = SingleFlight()
+    release = Event()
+    calls = []
+
+    def lookup():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            release.wait(1)
+            raise ValueError('Out of budget')
+        return 'result'
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [
+            executor.submit(
+                single_flight.do, 'key', lookup,
+                shared=lambda error: not isinstance(error, ValueError)
+            )
+            for _ in range(3)
+        ]
+        # Let the other calls join the first one before it finishes.
+        sleep(0.05)
+        release.set()
+
+        with raises(ValueError):
+            futures[0].result()
+        assert [future.result() for future in futures[1:]] == ['result'] * 2
+
+    assert len(calls) in (2, 3)
+
+
+def test_single_flight_waits_up_to_timeout():
+    single_flight = SingleFlight()
+    release = Event()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        leader = executor.submit(single_flight.do, 'key', release.wait, 1)
+        sleep(0.05)
+
+        with raises(FutureTimeoutError):
+            single_flight.do('key', release.wait, 1, timeout=0.01)
+
+        release.set()
+        assert leader.result() is True
+
+
+def test_single_flight_forgets_finished_calls():
+    single_flight = SingleFlight()
+    calls = []
+
+    for _ in range(2):
+        single_flight.do('key', calls.append, 'cisco.com')
+
+    assert calls == ['cisco.com', 'cisco.com']
+
+
+@fixture
+def clock(monkeypatch):
+    now = [0]
+    monkeypatch.setattr(concurrency, 'monotonic', lambda: now[0])
+    return now
+
+
+def call(limiter, latency=None, overloaded=False):
+    assert limiter.acquire(0)
+    limiter.release(latency, overloaded)
+
+
+def test_adaptive_limit_grows_while_latency_is_stable(clock):
+    limiter = AdaptiveLimiter(max_limit=10, initial_limit=2)
+
+    for _ in range(5):
+        call(limiter, 0.1)
+    assert limiter.stats()['limit'] == 3
+
+    for _ in range(1000):
+        call(limiter, 0.1)
+    assert limiter.stats()['limit'] == 10
+
+
+def test_adaptive_limit_backs_off_once_per_round_trip(clock):
+    limiter = AdaptiveLimiter(max_limit=16)
+    call(limiter, 0.1)
+
+    call(limiter, overloaded=True)
+    call(limiter, overloaded=True)
+    assert limiter.stats()['limit'] == 8
+
+    clock[0] += 0.1
+    call(limiter, overloaded=True)
+    assert limiter.stats()['limit'] == 4
+
+    for _ in range(10):
+        clock[0] += 1
+        call(limiter, overloaded=True)
+    assert limiter.stats()['limit'] == 1
+
+
+def test_adaptive_limit_backs_off_on_rising_latency(clock):
+    limiter = AdaptiveLimiter(max_limit=16)
+    for _ in range(10):
+        call(limiter, 0.1)
+
+    call(limiter, 0.15)
+    assert limiter.stats()['limit'] == 16
+
+    call(limiter, 0.5)
+    assert limiter.stats()['limit'] == 8
+
+
+def test_adaptive_limit_ignores_unrelated_failures(clock):
+    limiter = AdaptiveLimiter(max_limit=16, initial_limit=4)
+
+    for _ in range(10):
+        call(limiter)
+
+    assert limiter.stats()['limit'] == 4
+
+
+def test_adaptive_limit_queues_calls():
+    limiter = AdaptiveLimiter(max_limit=1)
+    assert limiter.acquire()
+
+    assert not limiter.acquire(0.01)
+
+    acquired = Event()
+    waiter = Thread(target=lambda: limiter.acquire() and acquired.set())
+    waiter.start()
+    while not limiter.stats()['waiting']:
+        sleep(0.001)
+
+    assert limiter.stats() == {'limit': 1, 'in_flight': 1, 'waiting': 1}
+
+    limiter.release(0.1)
+    assert acquired.wait(1)
+    waiter.join()
+    assert limiter.stats() == {'limit': 1, 'in_flight': 1, 'waiting': 0}
+
+
+def test_circuit_opens_on_failure_rate(clock):
+    breaker = CircuitBreaker(failure_rate=0.5, min_calls=4, window=10)
+
+    for failed in (True, False, True):
+        assert breaker.allow() is False
+        breaker.record(failed)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    # Calls which have not been made do not count.
+    assert breaker.allow() is False
+    breaker.record(None)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    assert breaker.allow() is False
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow() is None
+
+
+def test_circuit_forgets_failures_out_of_window(clock):
+    breaker = CircuitBreaker(failure_rate=0.5, min_calls=2, window=10)
+
+    breaker.record(True)
+    clock[0] = 11
+    breaker.record(False)
+    breaker.record(False)
+
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_circuit_probes_before_closing(clock):
+    breaker = CircuitBreaker(failure_rate=1, min_calls=1, open_for=30)
+    breaker.record(True)
+
+    clock[0] = 29
+    assert breaker.allow() is None
+
+    clock[0] = 30
+    assert breaker.allow() is True
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow() is None
+
+    breaker.record(True, probe=True)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow() is None
+
+    clock[0] = 60
+    assert breaker.allow() is True
+    breaker.record(None, probe=True)
+    assert breaker.allow() is True
+    breaker.record(False, probe=True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() is False
+
+
+def test_circuit_ignores_calls_started_before_it_opened(clock):
+    breaker = CircuitBreaker(failure_rate=1, min_calls=1, open_for=30)
+
+    # Two calls are started while the circuit is closed, the first one fails.
+    assert breaker.allow() is False
+    assert breaker.allow() is False
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # The other one only finishes once the circuit got half-open.
+    clock[0] = 30
+    assert breaker.allow() is True
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow() is None
+
+    breaker.record(True, probe=True)
+    assert breaker.state == CircuitBreaker.OPEN
@@ -1,8 +1,15 @@
 from http import HTTPStatus
+from time import sleep
 
 from pytest import fixture
+from requests.exceptions import ReadTimeout
 from unittest.mock import patch
 
+from api import client as c1fapp_client
+from api.concurrency import CircuitBreaker
+from api.errors import FORBIDDEN, KEY_ERROR, TIMEOUT, UNAVAILABLE
+
+from ..conftest import c1fapp_api_response_mock
 from .utils import headers
 
 
@@ -47,7 +54,7 @@ def valid_json():
     return [{'type': 'domain', 'value': 'onedrive.live.com'}]
 
 
-@patch('requests.post')
+@patch('requests.Session.post')
 def test_enrich_call_success(
         mock_request, route, client, valid_jwt,
         valid_json, c1fapp_response_ok, success_enrich_body
@@ -89,14 +96,16 @@ def valid_json_multiple():
             {'type': 'domain', 'value': 'cisco.com'}]
 
 
-@patch('requests.post')
+@patch('requests.Session.post')
 def test_enrich_call_success_with_extended_error_handling(
         mock_request, route, client, valid_jwt, valid_json_multiple,
         c1fapp_response_ok, c1fapp_response_unauthorized_creds,
-        success_enrich_body, unauthorized_creds_body
+        success_enrich_body
 ):
-    mock_request.side_effect = [c1fapp_response_ok,
-                                c1fapp_response_unauthorized_creds]
+    responses = {'onedrive.live.com': c1fapp_response_ok,
+                 'cisco.com': c1fapp_response_unauthorized_creds}
+    mock_request.side_effect = \
+        lambda *args, **kwargs: responses[kwargs['json']['request']]
     response = client.post(
         route, headers=headers(valid_jwt),
         json=valid_json_multiple
@@ -124,10 +133,15 @@ def test_enrich_call_success_with_extended_error_handling(
         assert response['data']['relationships']['docs'][0].pop('target_ref')
 
         assert response['data'] == success_enrich_body['data']
-        assert response['errors'] == unauthorized_creds_body['errors']
+        assert response['errors'] == [{
+            'type': 'warning',
+            'code': FORBIDDEN,
+            'message': 'Unable to look up cisco.com in C1fApp. '
+                       'Unexpected response from C1fApp: Invalid API key'
+        }]
 
 
-@patch('requests.post')
+@patch('requests.Session.post')
 def test_enrich_with_key_error(
         mock_request, route, client, valid_jwt,
         valid_json, c1fapp_invalid_response, key_error_expected_payload
@@ -145,7 +159,7 @@ def test_enrich_with_key_error(
     assert response == key_error_expected_payload
 
 
-@patch('requests.post')
+@patch('requests.Session.post')
 def test_enrich_with_ssl_error(
         mock_request, route, client, valid_jwt,
         valid_json, c1fapp_ssl_exception_mock,
@@ -162,3 +176,177 @@ def test_enrich_with_ssl_error(
 
     response = response.get_json()
     assert response == ssl_error_expected_payload
+
+
+@fixture(scope='module')
+def valid_json_ordered():
+    return [{'type': 'domain', 'value': f'{index}.example.com'}
+            for index in range(20)]
+
+
+@patch('requests.Session.post')
+def test_enrich_call_concurrent_lookups_keep_order(
+        mock_request, route, client, valid_jwt, valid_json_ordered
+):
+    def c1fapp_response(*args, **kwargs):
+        observable = kwargs['json']['request']
+        index = int(observable.split('.')[0])
+        # Make the earlier observables finish last.
+        sleep(0.001 * (20 - index))
+        return c1fapp_api_response_mock(
+            HTTPStatus.OK,
+            payload=[
+                {
+                    'feed_label': [observable],
+                    'domain': [observable],
+                    'address': [observable],
+                    'ip_address': [''],
+                    'confidence': [50],
+                    'reportime': ['2020-04-12'],
+                    'source': ['http://example.com'],
+                    'assessment': ['phishing']
+                }
+            ]
+        )
+
+    mock_request.side_effect = c1fapp_response
+
+    response = client.post(
+        route, headers=headers(valid_jwt), json=valid_json_ordered
+    )
+
+    assert response.status_code == HTTPStatus.OK
+
+    response = response.get_json()
+    if route == '/observe/observables':
+        assert mock_request.call_count == len(valid_json_ordered)
+
+        expected = [observable['value'] for observable in valid_json_ordered]
+        sightings = response['data']['sightings']['docs']
+        assert [s['observables'][0]['value'] for s in sightings] == expected
+        indicators = response['data']['indicators']['docs']
+        assert [i['short_description'] for i in indicators] == expected
+        relationships = response['data']['relationships']['docs']
+        assert [r['source_ref'] for r in relationships] == \
+            [s['id'] for s in sightings]
+
+
+@fixture(scope='module')
+def valid_json_duplicates():
+    return [{'type': 'domain', 'value': 'onedrive.live.com'},
+            {'type': 'domain', 'value': 'onedrive.live.com'},
+            {'type': 'domain', 'value': 'onedrive.live.com'}]
+
+
+@patch('requests.Session.post')
+def test_enrich_call_duplicates_are_looked_up_once(
+        mock_request, route, client, valid_jwt,
+        valid_json_duplicates, c1fapp_response_ok
+):
+    mock_request.return_value = c1fapp_response_ok
+
+    response = client.post(
+        route, headers=headers(valid_jwt), json=valid_json_duplicates
+    )
+
+    assert response.status_code == HTTPStatus.OK
+
+    response = response.get_json()
+    if route == '/observe/observables':
+        mock_request.assert_called_once()
+        assert response['data']['sightings']['count'] == 1
+        assert response['data']['indicators']['count'] == 1
+        assert response['data']['relationships']['count'] == 1
+
+
+@patch('requests.Session.post')
+def test_enrich_call_reports_timed_out_lookups_as_warnings(
+        mock_request, route, client, valid_jwt, valid_json_multiple,
+        c1fapp_response_ok
+):
+    def c1fapp_response(*args, **kwargs):
+        if kwargs['json']['request'] == 'cisco.com':
+            raise ReadTimeout()
+        return c1fapp_response_ok
+
+    mock_request.side_effect = c1fapp_response
+
+    response = client.post(
+        route, headers=headers(valid_jwt), json=valid_json_multiple
+    )
+
+    assert response.status_code == HTTPStatus.OK
+
+    response = response.get_json()
+    if route == '/observe/observables':
+        assert response['data']['sightings']['count'] == 1
+        assert response['errors'] == [{
+            'type': 'warning',
+            'code': TIMEOUT,
+            'message': 'C1fApp did not respond to the lookup of cisco.com '
+                       'within the time budget of the request.'
+        }]
+
+
+@patch('requests.Session.post')
+def test_enrich_call_isolates_broken_records(
+        mock_request, route, client, valid_jwt, valid_json_multiple,
+        c1fapp_response_ok, c1fapp_invalid_response
+):
+    responses = {'onedrive.live.com': c1fapp_invalid_response,
+                 'cisco.com': c1fapp_response_ok}
+    mock_request.side_effect = \
+        lambda *args, **kwargs: responses[kwargs['json']['request']]
+
+    response = client.post(
+        route, headers=headers(valid_jwt), json=valid_json_multiple
+    )
+
+    assert response.status_code == HTTPStatus.OK
+
+    response = response.get_json()
+    if route == '/observe/observables':
+        assert response['data']['sightings']['count'] == 1
+        assert [(error['type'], error['code'])
+                for error in response['errors']] == [('warning', KEY_ERROR)]
+
+
+@patch('requests.Session.post')
+def test_enrich_call_fails_if_all_lookups_fail(
+        mock_request, route, client, valid_jwt, valid_json_multiple,
+        c1fapp_response_unauthorized_creds, unauthorized_creds_body
+):
+    mock_request.return_value = c1fapp_response_unauthorized_creds
+
+    response = client.post(
+        route, headers=headers(valid_jwt), json=valid_json_multiple
+    )
+
+    assert response.status_code == HTTPStatus.OK
+
+    response = response.get_json()
+    if route == '/observe/observables':
+        assert response == unauthorized_creds_body
+
+
+@patch('requests.Session.post')
+def test_enrich_call_fails_fast_while_circuit_is_open(
+        mock_request, route, client, valid_jwt, valid_json_multiple,
+        monkeypatch
+):
+    breaker = CircuitBreaker()
+    breaker.state = CircuitBreaker.OPEN
+    breaker._opened_at = float('inf')
+    monkeypatch.setattr(c1fapp_client, '_circuit_breaker', breaker)
+
+    response = client.post(
+        route, headers=headers(valid_jwt), json=valid_json_multiple
+    )
+
+    assert response.status_code == HTTPStatus.OK
+
+    response = response.get_json()
+    if route == '/observe/observables':
+        mock_request.assert_not_called()
+        assert [(error['type'], error['code'])
+                for error in response['errors']] == [('fatal', UNAVAILABLE)]
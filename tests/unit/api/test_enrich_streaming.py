@@ -0,0 +1,80 @@
+import json
+from http import HTTPStatus
+from unittest.mock import patch
+
+from pytest import fixture, mark
+
+from api import utils
+from .test_enrich import c1fapp_api_response_mock
+from .utils import headers
+
+
+def c1fapp_records(observable, count):
+    return [
+        {
+            'feed_label': [f'Feed {index % 3}'],
+            'domain': [observable],
+            'address': [f'http://{observable}/{index}'],
+            'ip_address': ['1.1.1.1'],
+            'confidence': [index % 101],
+            'reportime': [f'2020-01-{index % 28 + 1:02}'],
+            'source': ['http://example.com'],
+            'assessment': ['phishing'],
+        }
+        for index in range(count)
+    ]
+
+
+@fixture
+def deterministic_ids(client, monkeypatch):
+    monkeypatch.setitem(
+        client.application.config, 'CTIM_DETERMINISTIC_IDS', True
+    )
+
+
+def observe(client, monkeypatch, valid_jwt, observables, stream):
+    with monkeypatch.context() as patch_:
+        patch_.setitem(
+            client.application.config, 'CTR_STREAM_RESPONSES', stream
+        )
+        patch_.setattr('api.client._cache', None)
+        patch_.setattr('api.client._negative_cache', None)
+        response = client.post(
+            '/observe/observables', headers=headers(valid_jwt),
+            json=observables
+        )
+
+    assert response.status_code == HTTPStatus.OK
+    return json.loads(response.get_data())
+
+
+def responses():
+    yield {'a.com': 5, 'b.com': 0, 'c.com': 50}
+    yield {'a.com': 5, 'b.com': HTTPStatus.FORBIDDEN, 'c.com': 5}
+    yield {'a.com': HTTPStatus.FORBIDDEN}
+    yield {'a.com': 0, 'b.com': 0}
+
+
+@mark.parametrize('spool_size', (1, utils.STREAM_SPOOL_SIZE))
+@mark.parametrize('upstream', list(responses()))
+@patch('requests.Session.post')
+def test_streamed_response_matches_buffered_one(
+        mock_request, client, valid_jwt, deterministic_ids, monkeypatch,
+        upstream, spool_size, c1fapp_response_unauthorized_creds
+):
+    monkeypatch.setattr(utils, 'STREAM_SPOOL_SIZE', spool_size)
+
+    def c1fapp_response(*args, **kwargs):
+        observable = kwargs['json']['request']
+        if upstream[observable] == HTTPStatus.FORBIDDEN:
+            return c1fapp_response_unauthorized_creds
+        return c1fapp_api_response_mock(
+            HTTPStatus.OK,
+            payload=c1fapp_records(observable, upstream[observable])
+        )
+
+    mock_request.side_effect = c1fapp_response
+    observables = [{'type': 'domain', 'value': value} for value in upstream]
+
+    assert observe(client, monkeypatch, valid_jwt, observables, True) == \
+        observe(client, monkeypatch, valid_jwt, observables, False)
@@ -33,7 +33,7 @@ def test_health_call_with_invalid_jwt_failure(
     assert response.json == invalid_jwt_expected_payload
 
 
-@patch('requests.post')
+@patch('requests.Session.post')
 def test_health_call_with_unauthorized_creds_failure(
     mock_request, route, client, valid_jwt,
     c1fapp_response_unauthorized_creds,
@@ -48,7 +48,7 @@ def test_health_call_with_unauthorized_creds_failure(
     assert response.json == unauthorized_creds_body
 
 
-@patch('requests.post')
+@patch('requests.Session.post')
 def test_health_call_success(
     mock_request, route, client, valid_jwt, c1fapp_response_ok
 ):
@@ -59,7 +59,7 @@ def test_health_call_success(
     assert response.json == {'data': {'status': 'ok'}}
 
 
-@patch('requests.post')
+@patch('requests.Session.post')
 def test_health_with_ssl_error(
         mock_request, route, client, valid_jwt,
         c1fapp_ssl_exception_mock,
@@ -0,0 +1,50 @@
+from concurrent.futures import ThreadPoolExecutor
+from uuid import UUID
+
+from api import ids
+from api.ids import RandomIds, content_id
+
+
+def test_random_ids_are_valid_uuid4():
+    generate_id = RandomIds(batch_size=4)
+
+    values = [generate_id() for _ in range(10)]
+
+    assert len(set(values)) == 10
+    for value in values:
+        uuid = UUID(value)
+        assert str(uuid) == value
+        assert uuid.version == 4
+
+
+def test_random_ids_draw_entropy_in_batches(monkeypatch):
+    calls = []
+
+    def urandom(size):
+        calls.append(size)
+        return bytes(size)
+
+    monkeypatch.setattr(ids.os, 'urandom', urandom)
+    generate_id = RandomIds(batch_size=100)
+
+    for _ in range(250):
+        generate_id()
+
+    assert calls == [1600] * 3
+
+
+def test_random_ids_are_unique_across_threads():
+    generate_id = RandomIds(batch_size=8)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        values = list(executor.map(lambda _: generate_id(), range(1000)))
+
+    assert len(set(values)) == 1000
+
+
+def test_content_ids_are_deterministic():
+    observable = {'type': 'domain', 'value': 'cisco.com'}
+
+    assert content_id(observable, 0) == content_id(observable, 0)
+    assert content_id(observable, 0) != content_id(observable, 1)
+    assert UUID(content_id(observable, 0)).version == 5
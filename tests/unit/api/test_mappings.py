@@ -0,0 +1,105 @@
+from pytest import fixture, raises
+
+from api.errors import C1fAppKeyError
+from api.mappings import Domain, IP, Mapping, URL
+from tests.benchmarks.bench_mapping import (
+    LegacyExtraction, OBSERVABLE, records
+)
+
+
+def normalize(entities):
+    """Replace the random IDs with their positions among the entities."""
+
+    sightings, indicators, relationships = entities
+    ids = {}
+    for entity in sightings + indicators + relationships:
+        ids[entity.pop('id')] = len(ids)
+    for relationship in relationships:
+        relationship['source_ref'] = ids[relationship['source_ref']]
+        relationship['target_ref'] = ids[relationship['target_ref']]
+    return entities
+
+
+@fixture
+def app_context(client):
+    with client.application.app_context():
+        yield
+
+
+def test_extract_matches_three_pass_extraction(app_context):
+    data = records(200)
+
+    assert normalize(Domain(OBSERVABLE).extract(data)) == \
+        normalize(LegacyExtraction(OBSERVABLE).extract(data))
+
+
+def test_extract_groups_relationships_by_feed(app_context):
+    data = records(50)
+
+    sightings, indicators, relationships = Domain(OBSERVABLE).extract(data)
+
+    feeds = list(dict.fromkeys(record['feed_label'][0] for record in data))
+    assert [i['short_description'] for i in indicators] == feeds
+    assert len(relationships) == len(sightings)
+
+    indicator_ids = [i['id'] for i in indicators]
+    targets = [indicator_ids.index(r['target_ref']) for r in relationships]
+    assert targets == sorted(targets)
+
+
+def test_extract_with_missing_field(app_context):
+    data = records(2)
+    del data[1]['confidence']
+
+    with raises(C1fAppKeyError):
+        Domain(OBSERVABLE).extract(data)
+
+
+def test_map_confidence(app_context):
+    mapping = Domain(OBSERVABLE)
+
+    assert mapping._map_confidence('0') == 'Low'
+    assert mapping._map_confidence(25) == 'Low'
+    assert mapping._map_confidence(26) == 'Medium'
+    assert mapping._map_confidence(79) == 'Medium'
+    assert mapping._map_confidence(80) == 'High'
+    assert mapping._map_confidence(100) == 'High'
+    assert mapping._map_confidence(-1) is None
+    assert mapping._map_confidence(101) is None
+
+
+def test_mapping_for_supported_types(app_context):
+    for type_, mapping_class in (('domain', Domain), ('ip', IP),
+                                 ('url', URL)):
+        assert Mapping.supports(type_)
+        mapping = Mapping.for_({'type': type_, 'value': 'cisco.com'})
+        assert type(mapping) is mapping_class
+
+
+def test_mapping_for_unsupported_types(app_context):
+    for type_ in ('md5', 'sha256', 'email'):
+        assert not Mapping.supports(type_)
+        assert Mapping.for_({'type': type_, 'value': 'cisco.com'}) is None
+
+
+def test_subclass_without_own_type_is_not_registered():
+    class CustomDomain(Domain):
+        pass
+
+    assert Mapping._registry['domain'] is Domain
+    assert CustomDomain not in Mapping._registry.values()
+
+
+def test_extract_with_deterministic_ids(client, monkeypatch, app_context):
+    monkeypatch.setitem(
+        client.application.config, 'CTIM_DETERMINISTIC_IDS', True
+    )
+    data = records(20)
+
+    first = Domain(OBSERVABLE).extract(data)
+    second = Domain(OBSERVABLE).extract(data)
+
+    assert first == second
+
+    ids = [entity['id'] for entities in first for entity in entities]
+    assert len(set(ids)) == len(ids)
@@ -0,0 +1,95 @@
+from http import HTTPStatus
+from unittest.mock import patch
+
+from api.errors import FORBIDDEN
+from api.metrics import (
+    C1FAPP_ERRORS, C1FAPP_REQUEST_DURATION, C1FAPP_RESPONSE_RECORDS,
+    RELAY_ENTITIES, RELAY_OBSERVABLES, Counter, Histogram
+)
+from .utils import headers
+
+
+def test_counter_exposition():
+    counter = Counter('lookups', 'Lookups by type.', ('type',))
+    counter.inc(type='ip')
+    counter.inc(2, type='domain')
+    counter.inc(type='ip')
+
+    assert counter.expose() == '\n'.join([
+        '# HELP lookups Lookups by type.',
+        '# TYPE lookups counter',
+        'lookups_total{type="domain"} 2',
+        'lookups_total{type="ip"} 2',
+    ])
+
+
+def test_histogram_exposition():
+    histogram = Histogram('latency', 'Latency.', (0.1, 1))
+    for value in (0.05, 0.1, 0.5, 2):
+        histogram.observe(value)
+
+    assert histogram.expose() == '\n'.join([
+        '# HELP latency Latency.',
+        '# TYPE latency histogram',
+        'latency_bucket{le="0.1"} 2',
+        'latency_bucket{le="1"} 3',
+        'latency_bucket{le="+Inf"} 4',
+        'latency_sum 2.65',
+        'latency_count 4',
+    ])
+
+
+@patch('requests.Session.post')
+def test_observe_observables_metrics(
+        mock_request, client, valid_jwt, c1fapp_response_ok
+):
+    mock_request.return_value = c1fapp_response_ok
+    lookups = C1FAPP_REQUEST_DURATION.count()
+    responses = C1FAPP_RESPONSE_RECORDS.count()
+    ips = RELAY_OBSERVABLES.value(type='ip')
+    hashes = RELAY_OBSERVABLES.value(type='sha256')
+    sightings = RELAY_ENTITIES.value(type='sighting')
+
+    client.post(
+        '/observe/observables', headers=headers(valid_jwt),
+        json=[{'type': 'ip', 'value': '1.1.1.1'},
+              {'type': 'ip', 'value': '1.1.1.1'},
+              {'type': 'sha256', 'value': '01' * 32}]
+    )
+
+    assert C1FAPP_REQUEST_DURATION.count() == lookups + 1
+    assert C1FAPP_RESPONSE_RECORDS.count() == responses + 1
+    assert RELAY_OBSERVABLES.value(type='ip') == ips + 1
+    assert RELAY_OBSERVABLES.value(type='sha256') == hashes + 1
+    assert RELAY_ENTITIES.value(type='sighting') == sightings + 1
+
+
+@patch('requests.Session.post')
+def test_c1fapp_error_metrics(
+        mock_request, client, valid_jwt, c1fapp_response_unauthorized_creds
+):
+    mock_request.return_value = c1fapp_response_unauthorized_creds
+    errors = C1FAPP_ERRORS.value(code=FORBIDDEN)
+
+    client.post('/health', headers=headers(valid_jwt))
+
+    assert C1FAPP_ERRORS.value(code=FORBIDDEN) == errors + 1
+
+
+def test_metrics_endpoint(client):
+    response = client.get('/metrics')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+
+    text = response.get_data(as_text=True)
+    for line in ('# TYPE c1fapp_request_duration_seconds histogram',
+                 '# TYPE c1fapp_errors counter',
+                 '# TYPE relay_observables counter',
+                 'relay_cache_hits_total{cache="c1fapp"}',
+                 'relay_cache_entries{cache="jwt"}',
+                 'c1fapp_connections_opened_total',
+                 'c1fapp_concurrency_limit 10',
+                 'c1fapp_concurrency_queue_depth 0',
+                 'c1fapp_circuit_state{state="closed"} 1'):
+        assert line in text
@@ -0,0 +1,137 @@
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from unittest.mock import patch
+
+from pytest import approx, fixture, raises
+
+from api import client as c1fapp_client, ratelimit
+from api.client import C1fAppClient
+from api.errors import C1fAppRateLimitError
+from api.ratelimit import (
+    MemoryTokenBucket, SQLiteTokenBucket, create_token_bucket
+)
+from ..conftest import c1fapp_api_response_mock
+
+
+@fixture
+def clock(monkeypatch):
+    now = [0]
+    monkeypatch.setattr(ratelimit, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(ratelimit, 'time', lambda: now[0])
+    return now
+
+
+def backends():
+    yield 'memory'
+    yield 'sqlite'
+
+
+@fixture(params=backends())
+def make_bucket(request, tmp_path):
+    def make_bucket(rate, burst):
+        if request.param == 'sqlite':
+            return SQLiteTokenBucket(
+                str(tmp_path / 'rate-limit.sqlite3'), rate, burst
+            )
+        return MemoryTokenBucket(rate, burst)
+
+    return make_bucket
+
+
+def test_bucket_allows_bursts(make_bucket, clock):
+    bucket = make_bucket(rate=2, burst=3)
+
+    assert [bucket.take('key', 0) for _ in range(3)] == [0, 0, 0]
+    assert bucket.take('key', 0) is None
+    assert bucket.take('another key', 0) == 0
+
+
+def test_bucket_queues_callers(make_bucket, clock):
+    bucket = make_bucket(rate=2, burst=1)
+
+    waits = [bucket.take('key', 10) for _ in range(4)]
+    assert waits == [0, 0.5, 1, 1.5]
+
+    clock[0] = 2
+    assert bucket.take('key', 10) == approx(0)
+    assert bucket.take('key', 0.4) is None
+    assert bucket.take('key', 0.5) == approx(0.5)
+
+
+def test_bucket_refills_up_to_burst(make_bucket, clock):
+    bucket = make_bucket(rate=1, burst=2)
+    bucket.take('key', 0)
+    bucket.take('key', 0)
+
+    clock[0] = 100
+    assert [bucket.take('key', 0) for _ in range(3)] == [0, 0, None]
+
+
+def test_disabled_bucket_never_waits(make_bucket, clock):
+    bucket = make_bucket(rate=0, burst=1)
+
+    assert [bucket.take('key', 0) for _ in range(100)] == [0] * 100
+
+
+def test_sqlite_buckets_are_shared(tmp_path, clock):
+    path = str(tmp_path / 'rate-limit.sqlite3')
+    buckets = [SQLiteTokenBucket(path, 1, 1) for _ in range(2)]
+
+    assert [bucket.take('key', 10) for bucket in buckets] == [0, 1]
+
+
+def test_concurrent_callers_are_spaced_out(make_bucket, clock):
+    bucket = make_bucket(rate=10, burst=1)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        waits = list(executor.map(
+            lambda _: bucket.take('key', 10), range(16)
+        ))
+
+    assert sorted(waits) == approx([index / 10 for index in range(16)])
+
+
+def test_create_token_bucket(client, tmp_path):
+    config = {
+        **client.application.config,
+        'C1FAPP_RATE_LIMIT_SQLITE_PATH': str(tmp_path / 'rate.sqlite3'),
+    }
+
+    assert isinstance(create_token_bucket(config), MemoryTokenBucket)
+
+    config['C1FAPP_RATE_LIMIT_BACKEND'] = 'sqlite'
+    assert isinstance(create_token_bucket(config), SQLiteTokenBucket)
+
+
+@patch('api.client.sleep')
+@patch('requests.Session.post')
+def test_client_lookups_are_rate_limited(
+        mock_request, mock_sleep, client, monkeypatch
+):
+    monkeypatch.setitem(client.application.config, 'C1FAPP_RATE_LIMIT', 1)
+    monkeypatch.setitem(
+        client.application.config, 'C1FAPP_RATE_LIMIT_BURST', 1
+    )
+    monkeypatch.setitem(
+        client.application.config, 'C1FAPP_RATE_LIMIT_MAX_WAIT', 1.5
+    )
+    mock_request.return_value = c1fapp_api_response_mock(HTTPStatus.OK)
+
+    with client.application.app_context():
+        c1fapp = C1fAppClient('key')
+        c1fapp.get_c1fapp_response('cisco.com')
+        c1fapp.get_c1fapp_response('cisco.org')
+
+        with raises(C1fAppRateLimitError):
+            c1fapp.get_c1fapp_response('cisco.net')
+
+        # Cache hits do not take tokens.
+        c1fapp.get_c1fapp_response('cisco.com')
+
+        # Nor do the lookups of the other API keys.
+        C1fAppClient('another key').get_c1fapp_response('cisco.net')
+
+    assert mock_request.call_count == 3
+    assert len(mock_sleep.call_args_list) == 1
+    assert mock_sleep.call_args[0][0] == approx(1, abs=0.1)
+    assert c1fapp_client._rate_limiter.enabled
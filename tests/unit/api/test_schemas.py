@@ -0,0 +1,65 @@
+import random
+
+from pytest import fixture, mark
+
+from api.schemas import (
+    OBSERVABLE_TYPE_CHOICES, ObservableSchema, ObservableValidator
+)
+
+
+def payloads():
+    yield None
+    yield {}
+    yield 'domain'
+    yield 1
+    yield []
+    yield [None, 1, 'domain', [], True]
+    yield [{}]
+    yield [{'type': 'domain'}]
+    yield [{'value': 'cisco.com'}]
+    yield [{'type': '', 'value': ''}]
+    yield [{'type': 'bad', 'value': 'cisco.com'}]
+    yield [{'type': 'Domain', 'value': 'cisco.com'}]
+    yield [{'type': 1, 'value': 2.5}]
+    yield [{'type': True, 'value': False}]
+    yield [{'type': None, 'value': None}]
+    yield [{'type': [], 'value': {}}]
+    yield [{'type': 'domain', 'value': 'cisco.com', 'extra': 1}]
+    yield [{'type': 'domain', 'value': ' '}, {'type': 'ip', 'value': '1'}]
+    yield [{'extra': 1, 'another': None, 'type': ''}]
+    yield [{'type': type_, 'value': 'x'} for type_ in OBSERVABLE_TYPE_CHOICES]
+
+
+@fixture(scope='module')
+def schema():
+    return ObservableSchema(many=True)
+
+
+@fixture(scope='module')
+def validator():
+    return ObservableValidator()
+
+
+@mark.parametrize('payload', list(payloads()))
+def test_validator_matches_schema(payload, schema, validator):
+    assert validator.validate(payload) == schema.validate(payload)
+
+
+def random_item(rng):
+    values = [
+        'domain', 'ip', 'url', 'md5', '', ' ', 'bad', None, 1, 1.5, True,
+        [], {}, 'cisco.com'
+    ]
+    fields = ['type', 'value', 'extra']
+    return {
+        field: rng.choice(values)
+        for field in rng.sample(fields, rng.randint(0, len(fields)))
+    }
+
+
+def test_validator_matches_schema_on_random_payloads(schema, validator):
+    rng = random.Random(0)
+
+    for _ in range(200):
+        payload = [random_item(rng) for _ in range(rng.randint(0, 5))]
+        assert validator.validate(payload) == schema.validate(payload)
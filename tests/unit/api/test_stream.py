@@ -0,0 +1,195 @@
+import json
+from http import HTTPStatus
+from unittest.mock import MagicMock, PropertyMock, patch
+
+from pytest import fixture, mark, raises
+from requests import exceptions
+
+from api import client as c1fapp_client
+from api.errors import TIMEOUT, UNAVAILABLE
+from api.stream import iter_json_array, prune, top_records
+from api.utils import latest_records
+from .utils import headers
+
+
+def chunked(text, size):
+    return [text[index:index + size] for index in range(0, len(text), size)]
+
+
+@fixture(scope='module')
+def records():
+    return [
+        {'reportime': [f'2020-0{index % 3 + 1}-01'], 'index': index,
+         'description': ['[{"nested": "json, text"}]'], 'confidence': [-1.5]}
+        for index in range(10)
+    ]
+
+
+def test_iter_json_array_handles_any_chunking(records):
+    text = json.dumps(records, indent=1)
+
+    for size in range(1, 40):
+        assert list(iter_json_array(chunked(text, size))) == records
+
+
+def test_iter_json_array_handles_empty_array():
+    assert list(iter_json_array([' [', ' ] '])) == []
+
+
+def test_iter_json_array_rejects_invalid_json():
+    with raises(ValueError):
+        list(iter_json_array(['{"key": "value"}']))
+
+    with raises(ValueError):
+        list(iter_json_array(['[{"key": "value"}']))
+
+
+def test_prune_drops_unused_fields(records):
+    assert list(prune(records[:1])) == [
+        {'reportime': ['2020-01-01'], 'confidence': [-1.5]}
+    ]
+
+
+def test_top_records_match_latest_records(records):
+    for limit in range(len(records) + 2):
+        assert top_records(iter(records), limit) == \
+            latest_records(records, limit)
+
+
+def c1fapp_api_stream_mock(text, chunk_size=7):
+    mock_response = MagicMock()
+
+    mock_response.status_code = HTTPStatus.OK
+    mock_response.ok = True
+    mock_response.encoding = 'utf-8'
+    mock_response.iter_content = \
+        lambda size: chunked(text.encode('utf-8'), chunk_size)
+
+    return mock_response
+
+
+@fixture
+def streaming(client, monkeypatch):
+    monkeypatch.setitem(
+        client.application.config, 'C1FAPP_STREAM_RESPONSES', True
+    )
+
+
+@patch('requests.Session.post')
+def test_streamed_enrich_call_success(
+        mock_request, client, valid_jwt, streaming,
+        c1fapp_response_ok, success_enrich_body
+):
+    mock_request.return_value = c1fapp_api_stream_mock(
+        json.dumps(c1fapp_response_ok.json())
+    )
+
+    response = client.post(
+        '/observe/observables', headers=headers(valid_jwt),
+        json=[{'type': 'domain', 'value': 'onedrive.live.com'}]
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert mock_request.call_args[1]['stream'] is True
+
+    data = response.get_json()['data']
+    for entity in ('sightings', 'indicators', 'relationships'):
+        assert data[entity]['docs'][0].pop('id')
+    for key in ('source_ref', 'target_ref'):
+        assert data['relationships']['docs'][0].pop(key)
+
+    assert data == success_enrich_body['data']
+
+
+@patch('requests.Session.post')
+def test_streamed_not_critical_error(
+        mock_request, client, valid_jwt, streaming
+):
+    mock_request.return_value = c1fapp_api_stream_mock(
+        'Empty Search! Available search: IPv4/URL/Domain'
+    )
+
+    response = client.post(
+        '/observe/observables', headers=headers(valid_jwt),
+        json=[{'type': 'domain', 'value': 'onedrive.live.com'}]
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.get_json() == {}
+
+
+@mark.parametrize('exception, code', (
+    (exceptions.ConnectionError, TIMEOUT),
+    (exceptions.ChunkedEncodingError, UNAVAILABLE),
+))
+@patch('requests.Session.post')
+def test_streamed_body_failure_is_isolated(
+        mock_request, exception, code, client, valid_jwt, streaming,
+        c1fapp_response_ok
+):
+    def broken_body(size):
+        yield b'[{"feed_label": '
+        raise exception()
+
+    def c1fapp_response(*args, **kwargs):
+        if kwargs['json']['request'] == 'cisco.com':
+            mock_response = c1fapp_api_stream_mock('')
+            mock_response.iter_content = broken_body
+            return mock_response
+        return c1fapp_api_stream_mock(json.dumps(c1fapp_response_ok.json()))
+
+    mock_request.side_effect = c1fapp_response
+
+    response = client.post(
+        '/observe/observables', headers=headers(valid_jwt),
+        json=[{'type': 'domain', 'value': 'onedrive.live.com'},
+              {'type': 'domain', 'value': 'cisco.com'}]
+    )
+
+    assert response.status_code == HTTPStatus.OK
+
+    response = response.get_json()
+    assert response['data']['sightings']['count'] == 1
+    assert [(error['type'], error['code'])
+            for error in response['errors']] == [('warning', code)]
+
+    # The failure counts as an overload of C1fApp.
+    limiter = c1fapp_client._concurrency_limiter
+    assert limiter.limit < client.application.config['C1FAPP_MAX_WORKERS']
+    assert limiter.in_flight == 0
+
+
+@mark.parametrize('exception, code', (
+    (exceptions.ConnectionError, TIMEOUT),
+    (exceptions.ChunkedEncodingError, UNAVAILABLE),
+))
+@patch('requests.Session.post')
+def test_streamed_error_body_failure_is_isolated(
+        mock_request, exception, code, client, valid_jwt, streaming,
+        c1fapp_response_ok
+):
+    def c1fapp_response(*args, **kwargs):
+        if kwargs['json']['request'] == 'cisco.com':
+            mock_response = c1fapp_api_stream_mock('')
+            mock_response.status_code = HTTPStatus.INTERNAL_SERVER_ERROR
+            mock_response.ok = False
+            # Like requests, reading the text reads the content first.
+            type(mock_response).content = PropertyMock(side_effect=exception)
+            type(mock_response).text = PropertyMock(side_effect=exception)
+            return mock_response
+        return c1fapp_api_stream_mock(json.dumps(c1fapp_response_ok.json()))
+
+    mock_request.side_effect = c1fapp_response
+
+    response = client.post(
+        '/observe/observables', headers=headers(valid_jwt),
+        json=[{'type': 'domain', 'value': 'onedrive.live.com'},
+              {'type': 'domain', 'value': 'cisco.com'}]
+    )
+
+    assert response.status_code == HTTPStatus.OK
+
+    response = response.get_json()
+    assert response['data']['sightings']['count'] == 1
+    assert [(error['type'], error['code'])
+            for error in response['errors']] == [('warning', code)]
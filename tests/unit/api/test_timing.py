@@ -0,0 +1,90 @@
+import json
+import logging
+import re
+from unittest.mock import patch
+
+from api.timing import PHASES, Timings, timed
+from .utils import headers
+
+
+def test_timings_header():
+    timings = Timings()
+    timings.add('mapping', 0.002)
+    timings.add('jwt', 0.001)
+    timings.add('upstream', 0.010, 'cisco.com')
+    timings.add('upstream', 0.020, 'say "hi"\\ – ok')
+    timings.add('mapping', 0.003)
+
+    metrics = timings.header().split(', ')
+
+    assert metrics[:5] == [
+        'jwt;dur=1.00',
+        'upstream;dur=30.00',
+        'mapping;dur=5.00',
+        'upstream-1;desc="cisco.com";dur=10.00',
+        'upstream-2;desc="say \\"hi\\"\\\\ ? ok";dur=20.00',
+    ]
+    assert re.fullmatch(r'total;dur=\d+\.\d\d', metrics[5])
+
+
+def test_timings_header_truncates_descriptions():
+    timings = Timings()
+    timings.add('upstream', 0.010, 'https://cisco.com/' + 'a' * 4096)
+
+    description = timings.header().split(', ')[1].split(';')[1]
+
+    assert description == f'desc="https://cisco.com/{"a" * 43}..."'
+
+
+def test_timings_fields():
+    timings = Timings()
+    timings.add('upstream', 0.010, 'cisco.com')
+
+    fields = timings.fields()
+
+    assert fields['phases_ms'] == {'upstream': 10.0}
+    assert fields['upstream_ms'] == [
+        {'observable': 'cisco.com', 'duration_ms': 10.0}
+    ]
+    assert fields['duration_ms'] >= 0
+
+
+def test_timed(client):
+    @timed('mapping')
+    def mapping():
+        return 'result'
+
+    with client.application.app_context():
+        from flask import g
+
+        assert mapping() == 'result'
+        assert list(g.timings.phases) == ['mapping']
+
+
+@patch('requests.Session.post')
+def test_observe_observables_timings(
+        mock_request, client, valid_jwt, c1fapp_response_ok, caplog
+):
+    mock_request.return_value = c1fapp_response_ok
+    observables = [{'type': 'domain', 'value': 'cisco.com'},
+                   {'type': 'ip', 'value': '1.1.1.1'}]
+
+    with caplog.at_level(logging.INFO, logger=client.application.name):
+        response = client.post(
+            '/observe/observables', headers=headers(valid_jwt),
+            json=observables
+        )
+        response.close()
+
+    names = [metric.split(';')[0]
+             for metric in response.headers['Server-Timing'].split(', ')]
+    assert names == [*PHASES, 'upstream-1', 'upstream-2', 'total']
+    assert 'desc="cisco.com"' in response.headers['Server-Timing']
+
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record['event'] == 'timings'
+    assert record['path'] == '/observe/observables'
+    assert record['status'] == 200
+    assert list(record['phases_ms']) == list(PHASES)
+    assert sorted(lookup['observable'] for lookup in record['upstream_ms']) \
+        == ['1.1.1.1', 'cisco.com']
@@ -0,0 +1,196 @@
+import json
+from http import HTTPStatus
+from time import time
+from unittest.mock import patch
+
+import flask
+from authlib.jose import jwt
+from pytest import fixture, mark, raises
+
+from api import utils
+from api.errors import InvalidJWTError
+from api.utils import (
+    claims_ttl, dumps, get_jwt, jsonify, latest_records, remove_duplicates
+)
+from .utils import headers
+
+
+def test_latest_records_match_full_sort():
+    records = [
+        {'reportime': ['2020-01-01'], 'id': 1},
+        {'reportime': ['2020-03-01'], 'id': 2},
+        {'reportime': ['2020-02-01'], 'id': 3},
+        {'reportime': ['2020-03-01'], 'id': 4},
+        {'reportime': ['2019-12-31'], 'id': 5},
+    ]
+
+    for limit in range(len(records) + 2):
+        assert latest_records(records, limit) == sorted(
+            records, key=lambda x: x['reportime'], reverse=True
+        )[:limit]
+
+
+def test_remove_duplicates_keeps_first_occurrences():
+    observables = [
+        {'type': 'domain', 'value': 'cisco.com'},
+        {'type': 'ip', 'value': '1.1.1.1'},
+        {'type': 'domain', 'value': 'cisco.com'},
+        {'type': 'url', 'value': 'cisco.com'},
+    ]
+
+    assert remove_duplicates(observables) == [
+        {'type': 'domain', 'value': 'cisco.com'},
+        {'type': 'ip', 'value': '1.1.1.1'},
+        {'type': 'url', 'value': 'cisco.com'},
+    ]
+
+
+@fixture(scope='module')
+def json_data():
+    return {
+        'z': [1, -2, 10 ** 20, True, False, None],
+        'a': {'nested': {'b': 'value', 'a': ''}},
+        'unicode': 'С1fApp \u2028 \u00e9 \U0001f600 \x7f',
+        'escapes': '"quoted" \\ / \b\f\n\r\t \x00 \x1f',
+        'url': 'https://onedrive.live.com/?authkey=%21AG7v3K%5Fv',
+        '': [],
+    }
+
+
+def test_dumps_is_compact_and_sorted(json_data):
+    assert dumps(json_data) == json.dumps(
+        json_data, ensure_ascii=False, separators=(',', ':'), sort_keys=True
+    ).encode('utf-8')
+    assert json.loads(dumps(json_data)) == json_data
+
+
+@mark.skipif(utils.orjson is None, reason='orjson is not installed')
+def test_dumps_with_and_without_orjson_match(json_data, monkeypatch):
+    fast = dumps(json_data)
+
+    monkeypatch.setattr(utils, 'orjson', None)
+
+    assert dumps(json_data) == fast
+
+
+def reescaped(data):
+    """Escape the non-ASCII characters of a JSON document like Flask."""
+
+    return json.dumps(
+        json.loads(data), separators=(',', ':'), sort_keys=True
+    ).encode('ascii') + b'\n'
+
+
+def test_jsonify_matches_flask_jsonify(client, json_data):
+    with client.application.app_context():
+        data = jsonify(json_data).data
+        flask_data = flask.jsonify(json_data).data
+
+    assert json.loads(data) == json.loads(flask_data)
+    # Only the non-ASCII characters are not escaped.
+    assert reescaped(data) == flask_data
+
+
+def test_unexpected_errors_are_serialized_alike(client):
+    response = client.get('/does-not-exist')
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert response.data == dumps({
+        'code': HTTPStatus.NOT_FOUND,
+        'message': response.get_json()['message'],
+        'reason': 'werkzeug.exceptions.NotFound',
+    }) + b'\n'
+
+
+def test_dumps_non_string_keys():
+    assert dumps({10: 'a', 2: 'b'}) == b'{"2":"b","10":"a"}'
+
+
+@patch('requests.Session.post')
+def test_enrich_response_without_orjson_match(
+        mock_request, client, valid_jwt, c1fapp_response_ok, monkeypatch
+):
+    mock_request.return_value = c1fapp_response_ok
+    monkeypatch.setitem(
+        client.application.config, 'CTIM_DETERMINISTIC_IDS', True
+    )
+
+    def enrich():
+        response = client.post(
+            '/observe/observables', headers=headers(valid_jwt),
+            json=[{'type': 'domain', 'value': 'onedrive.live.com'}]
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert response.mimetype == 'application/json'
+        return response.data
+
+    fast = enrich()
+
+    monkeypatch.setattr(utils, 'orjson', None)
+
+    assert enrich() == fast
+
+    with client.application.app_context():
+        assert reescaped(fast) == flask.jsonify(json.loads(fast)).data
+
+
+def test_claims_ttl():
+    now = time()
+
+    assert claims_ttl({}, 600) == 600
+    assert 0 < claims_ttl({'exp': now + 60}, 600) <= 60
+    assert claims_ttl({'exp': now + 6000}, 600) == 600
+    assert claims_ttl({'exp': now - 60}, 600) == 0
+    assert claims_ttl({'nbf': now + 60}, 600) == 0
+    assert claims_ttl({'nbf': now - 60}, 600) == 600
+    assert claims_ttl({'exp': 'tomorrow'}, 600) == 0
+
+
+@fixture
+def decode():
+    with patch.object(utils.jwt, 'decode', wraps=jwt.decode) as decode:
+        yield decode
+
+
+def claims_of(client, token):
+    with client.application.test_request_context(
+            headers=headers(token)
+    ):
+        return get_jwt()
+
+
+def test_get_jwt_reuses_verified_claims(client, valid_jwt, decode):
+    claims = claims_of(client, valid_jwt)
+
+    assert claims_of(client, valid_jwt) == claims
+    assert decode.call_count == 1
+
+
+def test_get_jwt_claims_are_not_shared(client, valid_jwt, decode):
+    claims_of(client, valid_jwt)['superuser'] = True
+
+    assert claims_of(client, valid_jwt)['superuser'] is False
+
+
+def test_get_jwt_cache_is_invalidated_by_secret_key(
+        client, valid_jwt, decode, monkeypatch
+):
+    claims_of(client, valid_jwt)
+
+    monkeypatch.setitem(client.application.config, 'SECRET_KEY', 'changed')
+
+    with raises(InvalidJWTError):
+        claims_of(client, valid_jwt)
+    assert decode.call_count == 2
+
+
+def test_get_jwt_does_not_cache_tokens_not_valid_yet(client, decode):
+    token = jwt.encode(
+        {'alg': 'HS256'}, {'key': 'key', 'nbf': int(time()) + 60},
+        client.application.secret_key
+    ).decode('ascii')
+
+    claims_of(client, token)
+    claims_of(client, token)
+
+    assert decode.call_count == 2
@@ -1,3 +1,4 @@
+from copy import deepcopy
 from datetime import datetime
 from requests.exceptions import SSLError
 from http import HTTPStatus
@@ -6,6 +7,7 @@ from unittest.mock import MagicMock
 from authlib.jose import jwt
 from pytest import fixture
 
+from api import client as c1fapp_client, utils
 from api.errors import PERMISSION_DENIED, INVALID_ARGUMENT, FORBIDDEN
 from app import app
 
@@ -26,6 +28,18 @@ def client(secret_key):
         yield client
 
 
+@fixture(autouse=True)
+def c1fapp_cache(monkeypatch):
+    # Do not let cached C1fApp responses, JWT claims, rate and concurrency
+    # limits or the circuit breaker state leak between the tests.
+    monkeypatch.setattr(c1fapp_client, '_cache', None)
+    monkeypatch.setattr(c1fapp_client, '_negative_cache', None)
+    monkeypatch.setattr(c1fapp_client, '_rate_limiter', None)
+    monkeypatch.setattr(c1fapp_client, '_concurrency_limiter', None)
+    monkeypatch.setattr(c1fapp_client, '_circuit_breaker', None)
+    monkeypatch.setattr(utils, '_jwt_cache', None)
+
+
 def c1fapp_api_response_mock(status_code, payload=None):
     mock_response = MagicMock()
 
@@ -50,51 +64,54 @@ def c1fapp_api_error_mock(status_code, text=None):
     return mock_response
 
 
+C1FAPP_RESPONSE_OK_PAYLOAD = [
+    {
+        "feed_label": [
+            "Phishtank"
+        ],
+        "domain": [
+            "onedrive.live.com"
+        ],
+        "description": [
+            "Microsoft"
+        ],
+        "derived": "direct",
+        "address": [
+            "https://onedrive.live.com/?authkey=%21AG7v3K%5Fv%5Fvmx0wU"
+        ],
+        "ip_address": [
+            "13.107.42.13"
+        ],
+        "asn": [
+            "-"
+        ],
+        "confidence": [
+            95
+        ],
+        "country": [
+            "US"
+        ],
+        "reportime": [
+            "2020-04-12"
+        ],
+        "source": [
+            "http://www.phishtank.com/phish_detail.php?phish_id=62",
+            "http://www.phishtank.com/phish_detail.php?phish_id=62"
+        ],
+        "asn_desc": [
+            "-"
+        ],
+        "assessment": [
+            "phishing"
+        ]
+    }
+]
+
+
 @fixture(scope='function')
 def c1fapp_response_ok():
     return c1fapp_api_response_mock(
-        HTTPStatus.OK, payload=[
-            {
-                "feed_label": [
-                    "Phishtank"
-                ],
-                "domain": [
-                    "onedrive.live.com"
-                ],
-                "description": [
-                    "Microsoft"
-                ],
-                "derived": "direct",
-                "address": [
-                    "https://onedrive.live.com/?authkey=%21AG7v3K%5Fv%5Fvmx0wU"
-                ],
-                "ip_address": [
-                    "13.107.42.13"
-                ],
-                "asn": [
-                    "-"
-                ],
-                "confidence": [
-                    95
-                ],
-                "country": [
-                    "US"
-                ],
-                "reportime": [
-                    "2020-04-12"
-                ],
-                "source": [
-                    "http://www.phishtank.com/phish_detail.php?phish_id=62",
-                    "http://www.phishtank.com/phish_detail.php?phish_id=62"
-                ],
-                "asn_desc": [
-                    "-"
-                ],
-                "assessment": [
-                    "phishing"
-                ]
-            }
-        ]
+        HTTPStatus.OK, payload=deepcopy(C1FAPP_RESPONSE_OK_PAYLOAD)
     )
 
 
@@ -0,0 +1,28 @@
+from pytest import raises
+
+from config import Config, compile_confidence_mapping
+
+
+def test_confidence_lookup_matches_mapping():
+    assert len(Config.CONFIDENCE_LOOKUP) == 101
+
+    for confidence, level in enumerate(Config.CONFIDENCE_LOOKUP):
+        assert [
+            level for range_, level in Config.CONFIDENCE_MAPPING.items()
+            if confidence in range_
+        ] == [level]
+
+
+def test_confidence_mapping_with_gap():
+    with raises(ValueError, match='Confidence 26 is not mapped.'):
+        compile_confidence_mapping({range(26): 'Low', range(27, 101): 'High'})
+
+
+def test_confidence_mapping_with_overlap():
+    with raises(ValueError, match='mapped twice'):
+        compile_confidence_mapping({range(27): 'Low', range(26, 101): 'High'})
+
+
+def test_confidence_mapping_out_of_bounds():
+    with raises(ValueError, match='out of 0-100'):
+        compile_confidence_mapping({range(102): 'Low'})